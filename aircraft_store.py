@@ -0,0 +1,303 @@
+import numpy as np
+from time_formatter import NS_PER_SEC
+
+# источник высоты в ряду 'altitude'
+ALT_BARO = 0
+ALT_GNSS = 1
+
+# тип столбца времени: целые наносекунды unix времени
+TIME_DTYPE = np.int64
+
+# ряды данных по бортам: имя ряда -> столбцы (имя, тип)
+SERIES = {
+    'altitude': (('t', TIME_DTYPE), ('alt', np.int32), ('source', np.int8)),
+    'speed': (('t', TIME_DTYPE), ('gs', np.float32)),
+    'selected_altitude': (('t', TIME_DTYPE), ('alt', np.int32)),
+    'altitude_difference': (('t', TIME_DTYPE), ('diff', np.int32)),
+    'baro_correction': (('t', TIME_DTYPE), ('pressure', np.float32)),
+    'positions': (('t', TIME_DTYPE), ('lat', np.float64), ('lon', np.float64)),
+    'courses': (('t', TIME_DTYPE), ('course', np.float32)),
+    'track_angles': (('t', TIME_DTYPE), ('angle', np.float32)),
+    # tc 19 подтип 1 (путевой угол) и подтип 3 (магнитный курс)
+    'gs_angles': (('t', TIME_DTYPE), ('angle', np.float32)),
+    'airspd_angles': (('t', TIME_DTYPE), ('angle', np.float32)),
+    # ответы наблюдения mode s: высота (df 4/20) и код ответчика mode a (df 5/21,
+    # четыре восьмеричные цифры записаны десятичным числом)
+    'surv_altitude': (('t', TIME_DTYPE), ('alt', np.int32)),
+    'surv_identity': (('t', TIME_DTYPE), ('squawk', np.int16)),
+    # поле mb ответов comm-b (df 20/21)
+    'commb': (('t', TIME_DTYPE), ('mb', np.uint64)),
+    # регистры comm-b, определённые по всей истории борта (bulk_commb):
+    # bds 4,0 - выбранная высота mcp/fcu (или fms), bds 5,0 - крен и истинная скорость,
+    # bds 6,0 - магнитный курс, приборная скорость и число маха
+    'bds40_selected_altitude': (('t', TIME_DTYPE), ('alt', np.int32)),
+    'bds50_roll': (('t', TIME_DTYPE), ('roll', np.float32)),
+    'bds50_tas': (('t', TIME_DTYPE), ('tas', np.float32)),
+    'bds60_heading': (('t', TIME_DTYPE), ('heading', np.float32)),
+    'bds60_ias': (('t', TIME_DTYPE), ('ias', np.float32)),
+    'bds60_mach': (('t', TIME_DTYPE), ('mach', np.float32)),
+
+    # времена сообщений для гистограмм интервалов
+    # reg 05
+    'airborne_pos_ts': (('t', TIME_DTYPE),),
+    # reg 06
+    'surface_pos_ts': (('t', TIME_DTYPE),),
+    # reg 08
+    'ident_ts': (('t', TIME_DTYPE),),
+    # reg 09
+    'spd_ts': (('t', TIME_DTYPE),),
+    # reg 61
+    'status_ts': (('t', TIME_DTYPE),),
+    'emg_ts': (('t', TIME_DTYPE),),
+    'tcas_ts': (('t', TIME_DTYPE),),
+    'mode_a_ts': (('t', TIME_DTYPE),),
+    # reg 62
+    'target_state_ts': (('t', TIME_DTYPE),),
+    # reg 65
+    'air_op_status_ts': (('t', TIME_DTYPE),),
+    'surf_op_status_ts': (('t', TIME_DTYPE),),
+    # df 11
+    'acq_ts': (('t', TIME_DTYPE),),
+}
+
+# растущий буфер типизированных столбцов одного ряда
+class SeriesBuffer:
+    def __init__(self, columns, capacity=64):
+        self.names = [name for name, _ in columns]
+        self.arrays = [np.empty(capacity, dtype=dtype) for _, dtype in columns]
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    # увеличение ёмкости с запасом (амортизированное добавление)
+    def _reserve(self, n):
+        capacity = len(self.arrays[0])
+        if n <= capacity:
+            return
+        new_capacity = max(n, capacity * 2)
+        for k, arr in enumerate(self.arrays):
+            grown = np.empty(new_capacity, dtype=arr.dtype)
+            grown[:self.size] = arr[:self.size]
+            self.arrays[k] = grown
+
+    def append(self, *values):
+        self._reserve(self.size + 1)
+        for arr, v in zip(self.arrays, values):
+            arr[self.size] = v
+        self.size += 1
+
+    def extend(self, *columns):
+        n = len(columns[0])
+        self._reserve(self.size + n)
+        for arr, column in zip(self.arrays, columns):
+            arr[self.size:self.size + n] = column
+        self.size += n
+
+    # столбцы в виде представлений numpy без копирования
+    def columns(self):
+        return tuple(arr[:self.size] for arr in self.arrays)
+
+    def column(self, name):
+        return self.arrays[self.names.index(name)][:self.size]
+
+    # при передаче в другой процесс передаются только заполненные элементы
+    def __getstate__(self):
+        return self.names, list(self.columns()), self.size
+
+    def __setstate__(self, state):
+        self.names, self.arrays, self.size = state
+
+# максимальный промежуток между соседними координатами, внутри которого
+# координаты интерполируются (нс)
+POSITION_MAX_GAP = 10 * NS_PER_SEC
+
+# индекс координат одного борта: столбцы упорядочены по времени,
+# поиск по массиву времён за один вызов np.searchsorted
+class PositionIndex:
+    def __init__(self, t, lat, lon):
+        order = np.argsort(t, kind='stable')
+        self.t = t[order]
+        self.lat = lat[order]
+        self.lon = lon[order]
+
+    def __len__(self):
+        return len(self.t)
+
+    # индексы ближайших по времени координат (при равенстве - более ранняя)
+    def nearest_indices(self, times):
+        times = np.asarray(times, dtype=TIME_DTYPE)
+        n = len(self.t)
+        if n == 1:
+            return np.zeros(len(times), dtype=np.intp)
+        right = np.clip(np.searchsorted(self.t, times), 1, n - 1)
+        left = right - 1
+        take_left = times - self.t[left] <= self.t[right] - times
+        return np.where(take_left, left, right)
+
+    # ближайшие по времени координаты и разница во времени до них (нс)
+    def nearest(self, times):
+        times = np.asarray(times, dtype=TIME_DTYPE)
+        idx = self.nearest_indices(times)
+        return self.lat[idx], self.lon[idx], np.abs(times - self.t[idx])
+
+    # координаты, линейно интерполированные между соседними по времени точками.
+    # вне интервала наблюдений и внутри промежутков длиннее max_gap - NaN
+    def interpolate(self, times, max_gap=POSITION_MAX_GAP):
+        times = np.asarray(times, dtype=TIME_DTYPE)
+        n = len(self.t)
+        if n == 0:
+            return np.full(len(times), np.nan), np.full(len(times), np.nan)
+        i = np.searchsorted(self.t, times, side='right')
+        lo = np.clip(i - 1, 0, n - 1)
+        hi = np.clip(i, 0, n - 1)
+        valid = (i > 0) & ((self.t[lo] == times) | ((i < n) & (self.t[hi] - self.t[lo] <= max_gap)))
+
+        # время отсчитывается от первой точки, чтобы не терять точность в float64
+        x = (self.t - self.t[0]).astype(np.float64)
+        xq = (times - self.t[0]).astype(np.float64)
+        lat = np.interp(xq, x, self.lat)
+        # долгота без скачка на линии перемены дат
+        lon_unwrapped = np.unwrap(self.lon, period=360)
+        lon = np.interp(xq, x, lon_unwrapped)
+        if np.any(lon_unwrapped != self.lon):
+            lon = (lon + 180) % 360 - 180
+
+        lat[~valid] = np.nan
+        lon[~valid] = np.nan
+        return lat, lon
+
+# хранилище данных по бортам одного файла логов
+class AircraftStore:
+    def __init__(self):
+        # имя ряда -> icao -> буфер
+        self.series = {name: {} for name in SERIES}
+
+        # борты с ads-b сообщениями
+        self.icao_list = set()
+        # время первого и последнего сообщения: icao -> [first, last]
+        self.times = {}
+        self.callsigns = {}
+        # активные режимы автопилота: icao -> множество сокращений
+        self.modes = {}
+        self.has_selected_alt = set()
+        self.has_gnss = set()
+        # индексы координат по времени: icao -> PositionIndex
+        self.position_indexes = {}
+        # борты, найденные индексным проходом, но ещё не декодированные полностью
+        self.undecoded = set()
+        # ads-b сообщения с ошибкой crc: исправленные (ошибка в одном бите) и отброшенные
+        self.crc_corrected = 0
+        self.crc_rejected = 0
+
+        # состояние декодирования
+        # последние чётное и нечётное cpr сообщения: icao -> [(msg, t), (msg, t)]
+        self.cpr_messages = {}
+        # последние координаты для локального декодирования cpr:
+        # icao -> (широта, долгота, время, время последнего глобального определения)
+        self.cpr_reference = {}
+        self.last_mode_a = {}
+        self.change_event_start = {}
+        # данные, по которым определены регистры comm-b: icao -> (число ответов comm-b,
+        # число точек опорных рядов ads-b)
+        self.commb_inferred = {}
+
+    def append(self, name, icao, *values):
+        buffers = self.series[name]
+        buf = buffers.get(icao)
+        if buf is None:
+            buf = buffers[icao] = SeriesBuffer(SERIES[name])
+        buf.append(*values)
+
+    # добавление столбцов значений сразу (для пакетной обработки)
+    def extend(self, name, icao, *columns):
+        buffers = self.series[name]
+        buf = buffers.get(icao)
+        if buf is None:
+            buf = buffers[icao] = SeriesBuffer(SERIES[name])
+        buf.extend(*columns)
+
+    # замена всех значений ряда борта (пустые столбцы - ряд удаляется)
+    def replace(self, name, icao, *columns):
+        buffers = self.series[name]
+        if len(columns[0]) == 0:
+            buffers.pop(icao, None)
+            return
+        buf = buffers[icao] = SeriesBuffer(SERIES[name], capacity=len(columns[0]))
+        buf.extend(*columns)
+
+    # столбцы ряда для борта; пустые массивы, если данных нет
+    def get(self, name, icao):
+        buf = self.series[name].get(icao)
+        if buf is None:
+            return tuple(np.empty(0, dtype=dtype) for _, dtype in SERIES[name])
+        return buf.columns()
+
+    def count(self, name, icao):
+        buf = self.series[name].get(icao)
+        return len(buf) if buf is not None else 0
+
+    def has(self, name, icao):
+        return self.count(name, icao) > 0
+
+    # индекс координат борта по времени; пересоздаётся, если добавились новые координаты
+    def position_index(self, icao):
+        index = self.position_indexes.get(icao)
+        if index is None or len(index) != self.count('positions', icao):
+            index = self.position_indexes[icao] = PositionIndex(*self.get('positions', icao))
+        return index
+
+    # время сообщения от борта с ads-b
+    def touch(self, icao, timestamp):
+        self.icao_list.add(icao)
+        times = self.times.get(icao)
+        if times is None:
+            self.times[icao] = [timestamp, timestamp]
+        else:
+            times[1] = timestamp
+
+    # удаление всех данных и состояния декодирования (файл логов перезаписан)
+    def clear(self):
+        self.__init__()
+
+    # добавление данных следующей по порядку части файла, обработанной отдельно:
+    # ряды бортов продолжаются, время последнего сообщения и позывной берутся из неё
+    def extend_from(self, other):
+        for name, buffers in other.series.items():
+            own = self.series[name]
+            for aa, buf in buffers.items():
+                if aa in own:
+                    own[aa].extend(*buf.columns())
+                else:
+                    own[aa] = buf
+        for aa, (first, last) in other.times.items():
+            times = self.times.get(aa)
+            if times is None:
+                self.times[aa] = [first, last]
+            else:
+                times[1] = last
+        self.icao_list |= other.icao_list
+        self.callsigns.update(other.callsigns)
+        for aa, modes in other.modes.items():
+            self.modes[aa] = self.modes.get(aa, set()) | modes
+        self.has_selected_alt |= other.has_selected_alt
+        self.has_gnss |= other.has_gnss
+        self.crc_corrected += other.crc_corrected
+        self.crc_rejected += other.crc_rejected
+        for aa in other.icao_list:
+            self.position_indexes.pop(aa, None)
+
+    # перенос всех данных бортов из другого хранилища (данные этих бортов заменяются)
+    def merge(self, other):
+        for name, buffers in other.series.items():
+            self.series[name].update(buffers)
+        self.icao_list |= other.icao_list
+        self.times.update(other.times)
+        self.callsigns.update(other.callsigns)
+        self.modes.update(other.modes)
+        self.has_selected_alt |= other.has_selected_alt
+        self.has_gnss |= other.has_gnss
+        self.crc_corrected += other.crc_corrected
+        self.crc_rejected += other.crc_rejected
+        for aa in other.icao_list:
+            self.position_indexes.pop(aa, None)
@@ -0,0 +1,74 @@
+import argparse
+import time
+from parsing import parse_ads_b_line, parse_log_block, read_log, parse_icao_set
+from offset_index import build_index
+
+DEFAULT_FILE = "data/2026-01-21_1.t4433"
+
+# построчный разбор в текстовом режиме (прежний способ чтения)
+def parse_text(file_path):
+    count = 0
+    with open(file_path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if parse_ads_b_line(line) is not None:
+                count += 1
+    return count
+
+# разбор блоками в двоичном режиме
+def parse_binary(file_path):
+    count = 0
+    for _ in read_log(file_path):
+        count += 1
+    return count
+
+# разбор всего файла одним блоком (как в пакетном режиме)
+def parse_whole(file_path):
+    with open(file_path, "rb") as f:
+        return len(parse_log_block(f.read())[0])
+
+# чтение и разбор только строк заданных бортов по индексу смещений строк
+def parse_indexed(file_path, index, icaos):
+    return len(parse_log_block(index.read_lines(file_path, icaos))[0])
+
+# лучшее время из нескольких повторов
+def measure(func, file_path, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = func(file_path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count, best
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Скорость разбора строк файла логов")
+    parser.add_argument("-f", "--file", help="Имя входного файла", default=DEFAULT_FILE)
+    parser.add_argument("-a", "--aircraft",
+                        help="ICAO адреса бортов для замера чтения по индексу")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="Число повторов")
+    args = parser.parse_args()
+
+    with open(args.file, "rb") as f:
+        total = sum(1 for _ in f)
+    print(f"Файл {args.file}: {total} строк")
+
+    readers = [("текстовый, построчно", parse_text),
+               ("двоичный, блоками", parse_binary),
+               ("двоичный, весь файл", parse_whole)]
+    if args.aircraft:
+        icaos = parse_icao_set(args.aircraft)
+        # индекс строится один раз, как при первом запуске с -a, и в замер не входит
+        start = time.perf_counter()
+        index = build_index(args.file)
+        print(f"Построение индекса: {(time.perf_counter() - start) * 1000:.1f} мс")
+        readers.append(("по индексу, -a", lambda path: parse_indexed(path, index, icaos)))
+
+    base = None
+    for name, func in readers:
+        count, elapsed = measure(func, args.file, args.repeat)
+        rate = total / elapsed
+        base = base or rate
+        print(f"{name:<24} {count:>10} сообщений  {elapsed * 1000:8.1f} мс  "
+              f"{rate:>12,.0f} строк/с  x{rate / base:.1f}")
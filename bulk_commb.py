@@ -0,0 +1,169 @@
+import numpy as np
+from pyModeS.extra import aero
+from time_formatter import NS_PER_SEC
+
+# регистры comm-b, определяемые по содержимому поля mb (0 - не определён)
+BDS_UNKNOWN = 0
+BDS40 = 40
+BDS50 = 50
+BDS60 = 60
+
+# наибольшая разница во времени до опорных данных ads-b того же борта (нс)
+COMMB_REF_MAX_DT = 10 * NS_PER_SEC
+# допуски проверки по опорным данным ads-b: путевая скорость bds 5,0 (узлы),
+# путевой угол bds 5,0 (градусы), истинная скорость (узлы, с учётом ветра),
+# магнитный курс bds 6,0 относительно путевого угла (градусы, снос и склонение),
+# приборная скорость относительно пересчитанной из числа маха (узлы, как в pyModeS)
+COMMB_GS_TOLERANCE = 50
+COMMB_TRACK_TOLERANCE = 20
+COMMB_TAS_TOLERANCE = 200
+COMMB_HEADING_TOLERANCE = 45
+COMMB_IAS_TOLERANCE = 20
+
+# поле mb (56 бит, байты 5-11) ответов df 20/21 из матрицы байт
+def commb_fields(matrix):
+    mb = np.zeros(len(matrix), dtype=np.uint64)
+    for k in range(4, 11):
+        mb = (mb << np.uint64(8)) | matrix[:, k].astype(np.uint64)
+    return mb
+
+# биты msb..lsb поля mb (нумерация с 1 от старшего, как в описании регистров)
+def _bits(mb, msb, lsb):
+    return ((mb >> np.uint64(56 - lsb)) & np.uint64((1 << (lsb - msb + 1)) - 1)).astype(np.int64)
+
+# бит состояния sb согласован с полем msb..lsb: при нулевом бите состояния поле пустое
+def _status_ok(mb, sb, msb, lsb):
+    return (_bits(mb, sb, sb) == 1) | (_bits(mb, msb, lsb) == 0)
+
+# значение поля при установленном бите состояния, иначе nan
+def _value(mb, sb, values):
+    return np.where(_bits(mb, sb, sb) == 1, values, np.nan)
+
+# число со знаком: бит знака sign_bit и поле msb..lsb в дополнительном коде
+def _signed(mb, sign_bit, msb, lsb):
+    value = _bits(mb, msb, lsb)
+    return np.where(_bits(mb, sign_bit, sign_bit) == 1, value - (1 << (lsb - msb + 1)), value)
+
+# bds 4,0 (выбранная высота): поля и признак допустимого формата (проверки is40 pyModeS)
+def decode_bds40(mb):
+    ok = mb != 0
+    for sb, msb, lsb in ((1, 2, 13), (14, 15, 26), (27, 28, 39), (48, 49, 51), (54, 55, 56)):
+        ok &= _status_ok(mb, sb, msb, lsb)
+    ok &= (_bits(mb, 40, 47) == 0) & (_bits(mb, 52, 53) == 0)
+    return ok, {
+        'mcp': _value(mb, 1, _bits(mb, 2, 13) * 16),
+        'fms': _value(mb, 14, _bits(mb, 15, 26) * 16),
+        'baro': _value(mb, 27, _bits(mb, 28, 39) * 0.1 + 800),
+    }
+
+# bds 5,0 (крен и путевой угол): поля и признак допустимого формата (проверки is50 pyModeS)
+def decode_bds50(mb):
+    fields = {
+        # pyModeS не включает бит знака в проверку бита состояния
+        'roll': _value(mb, 1, _signed(mb, 2, 3, 11) * 45 / 256),
+        'track': _value(mb, 12, np.mod(_signed(mb, 13, 14, 23) * 90 / 512, 360)),
+        'gs': _value(mb, 24, _bits(mb, 25, 34) * 2),
+        'track_rate': _value(mb, 35, _signed(mb, 36, 37, 45) * 8 / 256),
+        'tas': _value(mb, 46, _bits(mb, 47, 56) * 2),
+    }
+    ok = mb != 0
+    for sb, msb, lsb in ((1, 3, 11), (12, 13, 23), (24, 25, 34), (35, 36, 45), (46, 47, 56)):
+        ok &= _status_ok(mb, sb, msb, lsb)
+    # сравнения с nan ложны: отсутствующие поля не ограничивают
+    roll, gs, tas = fields['roll'], fields['gs'], fields['tas']
+    ok &= ~(np.abs(roll) > 50) & ~(gs > 600) & ~(tas > 600) & ~(np.abs(tas - gs) > 200)
+    return ok, fields
+
+# bds 6,0 (курс и скорость): поля и признак допустимого формата (проверки is60 pyModeS
+# без проверки по высоте из самого ответа - она выполняется по опорным данным)
+def decode_bds60(mb):
+    fields = {
+        'heading': _value(mb, 1, np.mod(_signed(mb, 2, 3, 12) * 90 / 512, 360)),
+        'ias': _value(mb, 13, _bits(mb, 14, 23)),
+        'mach': _value(mb, 24, _bits(mb, 25, 34) * 2.048 / 512),
+        'vr_baro': _value(mb, 35, _signed(mb, 36, 37, 45) * 32),
+        'vr_ins': _value(mb, 46, _signed(mb, 47, 48, 56) * 32),
+    }
+    ok = mb != 0
+    for sb, msb, lsb in ((1, 2, 12), (13, 14, 23), (24, 25, 34), (35, 36, 45), (46, 47, 56)):
+        ok &= _status_ok(mb, sb, msb, lsb)
+    ok &= ~(fields['ias'] > 500) & ~(fields['mach'] > 1)
+    ok &= ~(np.abs(fields['vr_baro']) > 6000) & ~(np.abs(fields['vr_ins']) > 6000)
+    return ok, fields
+
+# значения опорного ряда (t_ref упорядочены) в ближайшие моменты времени не дальше
+# max_dt, иначе nan
+def reference_values(t_ref, values, t, max_dt=COMMB_REF_MAX_DT):
+    n = len(t_ref)
+    if n == 0:
+        return np.full(len(t), np.nan)
+    if n == 1:
+        nearest = np.zeros(len(t), dtype=np.intp)
+    else:
+        right = np.clip(np.searchsorted(t_ref, t), 1, n - 1)
+        left = right - 1
+        nearest = np.where(t - t_ref[left] <= t_ref[right] - t, left, right)
+    return np.where(np.abs(t - t_ref[nearest]) <= max_dt, values[nearest].astype(np.float64), np.nan)
+
+# разница углов в градусах (0..180)
+def _angle_diff(a, b):
+    return np.abs(np.mod(a - b + 180, 360) - 180)
+
+# составляющие вектора скорости (узлы) по модулю и углу
+def _velocity(speed, angle):
+    rad = np.radians(angle)
+    return speed * np.sin(rad), speed * np.cos(rad)
+
+# определение регистра comm-b (bds 4,0 / 5,0 / 6,0) для всех ответов борта сразу:
+# сначала форматные проверки каждого регистра, затем проверка правдоподобия по опорным
+# данным ads-b того же борта в моменты ответов (gs_ref - путевая скорость, trk_ref -
+# путевой угол, alt_ref - барометрическая высота; nan - нет данных). ответ, подходящий
+# под 5,0 и 6,0, относится к регистру, вектор скорости которого ближе к опорному
+# (как is50or60 в pyModeS); остальные неоднозначные ответы не определяются.
+# возвращает коды регистров и поля регистров
+def infer_bds(mb, gs_ref, trk_ref, alt_ref):
+    ok40, f40 = decode_bds40(mb)
+    ok50, f50 = decode_bds50(mb)
+    ok60, f60 = decode_bds60(mb)
+
+    # bds 4,0: хотя бы одна выбранная высота в пределах эшелонов, давление - в пределах
+    # реальных значений
+    mcp, fms, baro = f40['mcp'], f40['fms'], f40['baro']
+    ok40 &= ~np.isnan(mcp) | ~np.isnan(fms)
+    ok40 &= ~(mcp > 50000) & ~(fms > 50000) & ~(baro < 900) & ~(baro > 1100)
+
+    # bds 5,0: путевая скорость и угол совпадают с ads-b
+    ok50 &= ~(np.abs(f50['gs'] - gs_ref) > COMMB_GS_TOLERANCE)
+    ok50 &= ~(_angle_diff(f50['track'], trk_ref) > COMMB_TRACK_TOLERANCE)
+    ok50 &= ~(np.abs(f50['tas'] - gs_ref) > COMMB_TAS_TOLERANCE)
+
+    # bds 6,0: приборная скорость согласована с числом маха на опорной высоте,
+    # истинная скорость и курс близки к путевым
+    alt_m = alt_ref * aero.ft
+    with np.errstate(invalid='ignore'):
+        ias_from_mach = aero.mach2cas(f60['mach'], alt_m) / aero.kts
+        tas_from_mach = aero.mach2tas(f60['mach'], alt_m) / aero.kts
+        tas_from_ias = aero.cas2tas(f60['ias'] * aero.kts, alt_m) / aero.kts
+    tas60 = np.where(np.isnan(tas_from_mach), tas_from_ias, tas_from_mach)
+    ok60 &= ~(np.abs(f60['ias'] - ias_from_mach) > COMMB_IAS_TOLERANCE)
+    ok60 &= ~(np.abs(tas60 - gs_ref) > COMMB_TAS_TOLERANCE)
+    ok60 &= ~(_angle_diff(f60['heading'], trk_ref) > COMMB_HEADING_TOLERANCE)
+
+    # 5,0 или 6,0: расстояние между векторами скорости регистра и опорным
+    both = ok50 & ok60
+    ref_x, ref_y = _velocity(gs_ref, trk_ref)
+    x50, y50 = _velocity(f50['gs'], f50['track'])
+    x60, y60 = _velocity(tas60, f60['heading'])
+    dist50 = np.hypot(x50 - ref_x, y50 - ref_y)
+    dist60 = np.hypot(x60 - ref_x, y60 - ref_y)
+    pick50 = both & (dist50 < dist60)
+    pick60 = both & (dist60 < dist50)
+    ok50 = (ok50 & ~both) | pick50
+    ok60 = (ok60 & ~both) | pick60
+
+    codes = np.full(len(mb), BDS_UNKNOWN, dtype=np.int8)
+    single = (ok40.astype(np.int8) + ok50 + ok60) == 1
+    codes[single & ok40] = BDS40
+    codes[single & ok50] = BDS50
+    codes[single & ok60] = BDS60
+    return codes, {**f40, **f50, **f60}
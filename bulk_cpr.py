@@ -0,0 +1,198 @@
+import numpy as np
+import pyModeS as pms
+from time_formatter import NS_PER_SEC
+
+# максимальный интервал между чётным и нечётным cpr сообщениями (нс)
+CPR_PAIR_MAX_DT = 10 * NS_PER_SEC
+# интервал, через который координаты снова определяются глобально по паре cpr сообщений (нс)
+CPR_GLOBAL_INTERVAL = 30 * NS_PER_SEC
+# наибольший возраст опорных координат для локального декодирования (нс): за это время
+# борт смещается намного меньше половины зоны cpr
+CPR_REFERENCE_MAX_AGE = 60 * NS_PER_SEC
+
+# число значений cpr координаты (17 бит)
+CPR_SCALE = 131072
+
+# nl(lat) - число зон по долготе: широты, до которых (по модулю) nl не меньше 59, 58, ... 2,
+# по той же формуле, что в pyModeS
+_NL_VALUES = np.arange(59, 1, -1)
+_NL_EDGES = np.degrees(np.arccos(np.sqrt((1 - np.cos(np.pi / 30)) / (1 - np.cos(2 * np.pi / _NL_VALUES)))))
+# широты ближе к границе зоны считаются по формуле pyModeS (результат floor на границе
+# зависит от округления)
+_NL_EDGE_TOLERANCE = 1e-9
+# окрестность 87 градусов, в которой pyModeS считает nl = 2
+_NL_87_TOLERANCE = 1e-08 + 1e-05 * 87
+
+# таблица nl по ячейкам широты (1/1000 градуса): -1 - в ячейке или рядом есть граница
+# зоны, там nl считается точно
+_NL_CELLS = 1000
+_cells = np.arange(90 * _NL_CELLS + 1)
+_cell_lo = _cells / _NL_CELLS - 2 * _NL_EDGE_TOLERANCE
+_cell_hi = (_cells + 1) / _NL_CELLS + 2 * _NL_EDGE_TOLERANCE
+_NL_TABLE = np.where(np.searchsorted(_NL_EDGES, _cell_lo) == np.searchsorted(_NL_EDGES, _cell_hi),
+                     59 - np.searchsorted(_NL_EDGES, _cell_lo), -1)
+_NL_TABLE[(_cell_hi >= 87 - _NL_87_TOLERANCE) & (_cell_lo <= 87 + _NL_87_TOLERANCE)] = -1
+del _cells, _cell_lo, _cell_hi
+
+# точный nl для широт у границ зон: двоичный поиск по границам, у самой границы -
+# формула pyModeS
+def _cpr_nl_exact(lat):
+    x = np.abs(lat)
+    k = np.searchsorted(_NL_EDGES, x)
+    nl = 59 - k
+
+    # особые случаи pyModeS: около 87 градусов - 2 зоны, около экватора - 59
+    nl[np.abs(x - 87) <= _NL_87_TOLERANCE] = 2
+    nl[x <= 1e-08] = 59
+
+    near = (np.abs(x - _NL_EDGES[np.minimum(k, len(_NL_EDGES) - 1)]) < _NL_EDGE_TOLERANCE) | \
+           (np.abs(x - _NL_EDGES[np.maximum(k - 1, 0)]) < _NL_EDGE_TOLERANCE)
+    for i in np.flatnonzero(near).tolist():
+        nl[i] = pms.common.cprNL(float(lat[i]))
+    return nl
+
+# nl для массива широт по таблице, совпадает с pms.common.cprNL
+def cpr_nl(lat):
+    lat = np.asarray(lat, dtype=np.float64)
+    cell = np.minimum(np.abs(lat) * _NL_CELLS, len(_NL_TABLE) - 1).astype(np.int64)
+    nl = _NL_TABLE[cell]
+    exact = np.flatnonzero(nl < 0)
+    if len(exact):
+        nl[exact] = _cpr_nl_exact(lat[exact])
+    return nl
+
+# cpr широта и долгота (17 бит) из матрицы байт сообщений о положении в воздухе (tc 9-18)
+def cpr_fields(matrix):
+    m = matrix.astype(np.uint32)
+    # биты 55-71 - широта, 72-88 - долгота
+    lat = ((m[:, 6] << 24 | m[:, 7] << 16 | m[:, 8] << 8 | m[:, 9]) >> 9) & 0x1FFFF
+    lon = (m[:, 8] << 16 | m[:, 9] << 8 | m[:, 10]) & 0x1FFFF
+    return lat.astype(np.int64), lon.astype(np.int64)
+
+# глобальное декодирование пар сообщений (как pms.adsb.airborne_position): cpr координаты
+# чётного и нечётного сообщений в долях зоны, even_newer - чётное сообщение новее.
+# возвращает широту, долготу и признак, что оба сообщения в одной зоне по широте
+def cpr_global(lat_even, lon_even, lat_odd, lon_odd, even_newer):
+    j = np.floor(59 * lat_even - 60 * lat_odd + 0.5)
+    rlat_even = 6.0 * (np.mod(j, 60) + lat_even)
+    rlat_odd = (360 / 59) * (np.mod(j, 59) + lat_odd)
+    rlat_even = np.where(rlat_even >= 270, rlat_even - 360, rlat_even)
+    rlat_odd = np.where(rlat_odd >= 270, rlat_odd - 360, rlat_odd)
+
+    nl_even = cpr_nl(rlat_even)
+    valid = nl_even == cpr_nl(rlat_odd)
+
+    lat = np.where(even_newer, rlat_even, rlat_odd)
+    ni = np.maximum(np.where(even_newer, nl_even, nl_even - 1), 1)
+    m = np.floor(lon_even * (nl_even - 1) - lon_odd * nl_even + 0.5)
+    lon = (360 / ni) * (np.mod(m, ni) + np.where(even_newer, lon_even, lon_odd))
+    lon = np.where(lon > 180, lon - 360, lon)
+    return lat, lon, valid
+
+# локальное декодирование относительно опорных координат
+# (как pms.adsb.airborne_position_with_ref)
+def cpr_local(lat_cpr, lon_cpr, oe, lat_ref, lon_ref):
+    d_lat = np.where(oe == 1, 360 / 59, 360 / 60)
+    j = np.floor(0.5 + lat_ref / d_lat - lat_cpr)
+    lat = d_lat * (j + lat_cpr)
+
+    ni = cpr_nl(lat) - oe
+    d_lon = np.where(ni > 0, 360 / np.maximum(ni, 1), 360.0)
+    m = np.floor(0.5 + lon_ref / d_lon - lon_cpr)
+    return lat, d_lon * (m + lon_cpr)
+
+# координаты по сообщениям о положении в воздухе нескольких бортов без предыдущего
+# состояния: строки отсортированы по бортам (new_group - первая строка борта), внутри
+# борта - в порядке файла. t - время (нс), lat_cpr/lon_cpr - 17-битные cpr координаты,
+# oe - флаг чётности. результат совпадает с последовательной обработкой (processing):
+# первое определение и перепроверка раз в CPR_GLOBAL_INTERVAL - глобально по паре
+# с последним сообщением другой чётности, остальные - локально относительно
+# координат предыдущего сообщения.
+# возвращает широту, долготу (nan без координат), признак координат и признак
+# глобального определения
+def resolve_positions(new_group, t, lat_cpr, lon_cpr, oe):
+    n = len(t)
+    t = np.asarray(t, dtype=np.int64)
+    oe = np.asarray(oe, dtype=np.int64)
+    lat_cpr = np.asarray(lat_cpr) / CPR_SCALE
+    lon_cpr = np.asarray(lon_cpr) / CPR_SCALE
+    lat = np.full(n, np.nan)
+    lon = np.full(n, np.nan)
+    fixed = np.zeros(n, dtype=bool)
+    is_global = np.zeros(n, dtype=bool)
+    if n == 0:
+        return lat, lon, fixed, is_global
+
+    rows = np.arange(n)
+    group_start = np.maximum.accumulate(np.where(new_group, rows, 0))
+
+    # пара - последнее предыдущее сообщение борта другой чётности
+    last_even = np.maximum.accumulate(np.where(oe == 0, rows, -1))
+    last_odd = np.maximum.accumulate(np.where(oe == 1, rows, -1))
+    partner = np.where(oe == 0, last_odd, last_even)
+    paired = partner >= group_start
+    partner = np.maximum(partner, 0)
+    paired &= np.abs(t - t[partner]) < CPR_PAIR_MAX_DT
+
+    # глобальное декодирование всех пар
+    pairs = np.flatnonzero(paired)
+    even = np.where(oe[pairs] == 0, pairs, partner[pairs])
+    odd = np.where(oe[pairs] == 1, pairs, partner[pairs])
+    global_lat, global_lon, valid = cpr_global(lat_cpr[even], lon_cpr[even], lat_cpr[odd], lon_cpr[odd],
+                                               t[even] > t[odd])
+    candidates = pairs[valid]
+    global_lat = global_lat[valid]
+    global_lon = global_lon[valid]
+
+    # участки без перерывов дольше CPR_REFERENCE_MAX_AGE: в начале участка опорных
+    # координат нет, первое определение - глобальное
+    gap = np.r_[True, np.diff(t) > CPR_REFERENCE_MAX_AGE]
+    seg_bounds = np.append(np.flatnonzero(new_group | gap), n)
+
+    # глобальные определения: первое на участке, затем первое не раньше чем через
+    # CPR_GLOBAL_INTERVAL после предыдущего глобального (их немного, поиск по кандидатам)
+    chosen = []
+    cand_bounds = np.searchsorted(candidates, seg_bounds).tolist()
+    for s, e, lo, hi in zip(seg_bounds[:-1].tolist(), seg_bounds[1:].tolist(), cand_bounds[:-1], cand_bounds[1:]):
+        if lo == hi:
+            continue
+        seg_t = t[candidates[lo:hi]]
+        if np.all(seg_t[1:] >= seg_t[:-1]):
+            # для каждого кандидата - первый кандидат через CPR_GLOBAL_INTERVAL
+            following = np.searchsorted(seg_t, seg_t + CPR_GLOBAL_INTERVAL).tolist()
+            k = 0
+            while k < hi - lo:
+                chosen.append(lo + k)
+                k = max(following[k], k + 1)
+        else:
+            k = 0
+            while k < hi - lo:
+                chosen.append(lo + k)
+                later = np.flatnonzero(seg_t[k + 1:] >= seg_t[k] + CPR_GLOBAL_INTERVAL)
+                k = k + 1 + int(later[0]) if len(later) else hi - lo
+        fixed[candidates[lo]:e] = True
+
+    chosen = np.array(chosen, dtype=np.int64)
+    global_rows = candidates[chosen]
+    is_global[global_rows] = True
+    lat[global_rows] = global_lat[chosen]
+    lon[global_rows] = global_lon[chosen]
+
+    # локальное декодирование относительно координат предыдущего сообщения: начальное
+    # приближение - последнее глобальное определение, затем пересчитываются сообщения,
+    # у которых изменились координаты предыдущего, пока изменения не прекратятся
+    local = fixed & ~is_global
+    ref = np.maximum.accumulate(np.where(is_global, rows, 0))
+    lat[local] = lat[ref[local]]
+    lon[local] = lon[ref[local]]
+    todo = np.flatnonzero(local)
+    while len(todo):
+        new_lat, new_lon = cpr_local(lat_cpr[todo], lon_cpr[todo], oe[todo], lat[todo - 1], lon[todo - 1])
+        changed = (new_lat != lat[todo]) | (new_lon != lon[todo])
+        lat[todo] = new_lat
+        lon[todo] = new_lon
+        todo = todo[changed] + 1
+        todo = todo[todo < n]
+        todo = todo[local[todo]]
+
+    return lat, lon, fixed, is_global
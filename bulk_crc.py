@@ -0,0 +1,134 @@
+import numpy as np
+from bulk_decode import MESSAGE_BYTES, messages_to_matrix, decode_headers
+from parsing import SURVEILLANCE_LENGTHS
+
+# порождающий многочлен crc-24 mode s (без старшего члена x^24)
+CRC_GENERATOR = 0xFFF409
+
+# результат проверки crc одного сообщения
+CRC_OK = 0
+CRC_CORRECTED = 1
+CRC_REJECTED = 2
+
+# crc одного байта (остаток от деления байта, сдвинутого на 16 бит, на многочлен)
+def _byte_table():
+    table = []
+    for b in range(256):
+        crc = b << 16
+        for _ in range(8):
+            crc = (crc << 1) ^ CRC_GENERATOR if crc & 0x800000 else crc << 1
+        table.append(crc & 0xFFFFFF)
+    return table
+
+_CRC_TABLE_LIST = _byte_table()
+CRC_TABLE = np.array(_CRC_TABLE_LIST, dtype=np.uint32)
+
+# синдромы сообщений в матрице байт: crc данных (все байты, кроме трёх последних),
+# сложенный по модулю 2 с полем чётности; 0 - сообщение без ошибок.
+# n_bytes - длина сообщений (14 - длинные, 7 - короткие)
+def crc_syndromes(matrix, n_bytes=MESSAGE_BYTES):
+    crc = np.zeros(len(matrix), dtype=np.uint32)
+    for k in range(n_bytes - 3):
+        crc = ((crc << 8) & 0xFFFFFF) ^ CRC_TABLE[(crc >> 16) ^ matrix[:, k]]
+    tail = matrix[:, n_bytes - 3:n_bytes].astype(np.uint32)
+    return crc ^ ((tail[:, 0] << 16) | (tail[:, 1] << 8) | tail[:, 2])
+
+# синдром одного hex сообщения любой длины
+def crc_syndrome(msg_str):
+    data = bytes.fromhex(msg_str)
+    crc = 0
+    for b in data[:-3]:
+        crc = ((crc << 8) & 0xFFFFFF) ^ _CRC_TABLE_LIST[(crc >> 16) ^ b]
+    return crc ^ int.from_bytes(data[-3:], 'big')
+
+# синдромы ошибки в одном бите длинного сообщения и номера битов (от старшего),
+# упорядоченные по синдрому. биты поля df (первые 5) не исправляются, чтобы
+# не превращать сообщения других форматов в ads-b
+def _single_bit_table():
+    bits = np.arange(5, MESSAGE_BYTES * 8)
+    matrix = np.zeros((len(bits), MESSAGE_BYTES), dtype=np.uint8)
+    matrix[np.arange(len(bits)), bits // 8] = 0x80 >> (bits % 8)
+    syndromes = crc_syndromes(matrix)
+    order = np.argsort(syndromes)
+    return syndromes[order], bits[order]
+
+SINGLE_BIT_SYNDROMES, SINGLE_BIT_POSITIONS = _single_bit_table()
+_SINGLE_BIT = dict(zip(SINGLE_BIT_SYNDROMES.tolist(), SINGLE_BIT_POSITIONS.tolist()))
+
+# проверка crc сообщений ads-b (df 17/18) в матрице байт с исправлением ошибки
+# в одном бите. lengths - длины hex сообщений (не 28 символов - сообщение отбрасывается).
+# возвращает матрицу (исправленную копию, если были исправления), признаки
+# исправленных и отброшенных строк
+def correct_adsb(matrix, df, lengths):
+    adsb = (df == 17) | (df == 18)
+    rejected = adsb & (lengths != MESSAGE_BYTES * 2)
+    corrected = np.zeros(len(matrix), dtype=bool)
+
+    rows = np.flatnonzero(adsb & ~rejected)
+    syndromes = crc_syndromes(matrix[rows])
+    bad = syndromes != 0
+    rows, syndromes = rows[bad], syndromes[bad]
+    k = np.minimum(np.searchsorted(SINGLE_BIT_SYNDROMES, syndromes), len(SINGLE_BIT_SYNDROMES) - 1)
+    found = SINGLE_BIT_SYNDROMES[k] == syndromes
+    rejected[rows[~found]] = True
+
+    fix_rows = rows[found]
+    if len(fix_rows):
+        bits = SINGLE_BIT_POSITIONS[k[found]]
+        matrix = matrix.copy()
+        matrix[fix_rows, bits // 8] ^= (0x80 >> (bits % 8)).astype(np.uint8)
+        corrected[fix_rows] = True
+    return matrix, corrected, rejected
+
+# проверка crc одного сообщения ads-b с исправлением ошибки в одном бите:
+# (сообщение, CRC_OK / CRC_CORRECTED / CRC_REJECTED), при отбрасывании сообщение - None
+def correct_message(msg_str):
+    if len(msg_str) != MESSAGE_BYTES * 2:
+        return None, CRC_REJECTED
+    syndrome = crc_syndrome(msg_str)
+    if syndrome == 0:
+        return msg_str, CRC_OK
+    bit = _SINGLE_BIT.get(syndrome)
+    if bit is None:
+        return None, CRC_REJECTED
+    value = int(msg_str, 16) ^ (1 << (MESSAGE_BYTES * 8 - 1 - bit))
+    return f"{value:0{MESSAGE_BYTES * 2}X}", CRC_CORRECTED
+
+# hex строки строк матрицы байт
+def matrix_to_messages(matrix):
+    return [row.tobytes().hex().upper() for row in matrix]
+
+# длины hex сообщений списка
+def message_lengths(messages):
+    return np.fromiter(map(len, messages), dtype=np.int64, count=len(messages))
+
+# проверка crc ads-b сообщений списка hex строк: исправленные сообщения заменяются
+# в самом списке. возвращает матрицу байт (с исправлениями), признаки исправленных
+# и отброшенных сообщений
+def correct_messages(messages):
+    matrix = messages_to_matrix(messages)
+    df = decode_headers(matrix)['df']
+    matrix, corrected, rejected = correct_adsb(matrix, df, message_lengths(messages))
+    rows = np.flatnonzero(corrected)
+    for i, msg in zip(rows.tolist(), matrix_to_messages(matrix[rows])):
+        messages[i] = msg
+    return matrix, corrected, rejected
+
+# адреса бортов из ответов наблюдения (df 4/5/20/21): поле ap - crc данных, сложенный
+# с адресом, поэтому синдром сообщения и есть адрес. проверить такой адрес по самому
+# сообщению нельзя - любая ошибка даёт другой адрес, поэтому он сверяется со списком
+# известных бортов. -1 - не ответ наблюдения или неверная длина
+def recover_addresses(matrix, df, lengths):
+    address = np.full(len(matrix), -1, dtype=np.int64)
+    for fmt, n_hex in SURVEILLANCE_LENGTHS.items():
+        rows = np.flatnonzero((df == fmt) & (lengths == n_hex))
+        if len(rows):
+            address[rows] = crc_syndromes(matrix[rows], n_hex // 2)
+    return address
+
+# адрес борта из одного ответа наблюдения (hex строка) или None
+def surveillance_address(msg_str):
+    n_hex = SURVEILLANCE_LENGTHS.get(int(msg_str[:2], 16) >> 3)
+    if n_hex is None or len(msg_str) != n_hex:
+        return None
+    return f"{crc_syndrome(msg_str):06X}"
@@ -0,0 +1,57 @@
+import numpy as np
+from parsing import parse_log_block
+
+# длина длинного сообщения mode s в байтах (112 бит)
+MESSAGE_BYTES = 14
+
+# загрузка всего файла: списки времён и hex сообщений
+def load_log(file_path):
+    with open(file_path, "rb") as f:
+        return parse_log_block(f.read())
+
+# загрузка всех hex сообщений в матрицу байт N x 14
+# короткие сообщения (56 бит) дополняются нулями справа
+def messages_to_matrix(messages):
+    if not messages:
+        return np.zeros((0, MESSAGE_BYTES), dtype=np.uint8)
+
+    width = MESSAGE_BYTES * 2
+    joined = ''.join([m[:width].ljust(width, '0') for m in messages])
+    return np.frombuffer(bytes.fromhex(joined), dtype=np.uint8).reshape(-1, MESSAGE_BYTES)
+
+# перевод массива целочисленных icao адресов в строки (через уникальные значения)
+def icao_to_str(icao_int):
+    if len(icao_int) == 0:
+        return np.zeros(0, dtype='<U6')
+    unique, inverse = np.unique(icao_int, return_inverse=True)
+    unique_str = np.array([f"{a:06X}" for a in unique.tolist()])
+    return unique_str[inverse]
+
+# векторное декодирование заголовков всех сообщений за один проход:
+# downlink format, icao адрес, type code, подтип и флаг чётности cpr
+def decode_headers(matrix):
+    m = matrix.astype(np.uint32)
+
+    # df - первые 5 бит, значения 24 и выше означают df 24
+    df = np.minimum(m[:, 0] >> 3, 24)
+
+    # адрес в битах 9-32 (для df 11, 17, 18)
+    icao = (m[:, 1] << 16) | (m[:, 2] << 8) | m[:, 3]
+
+    is_adsb = (df == 17) | (df == 18)
+
+    # type code - первые 5 бит поля ME, подтип - следующие 3 бита
+    tc = np.where(is_adsb, m[:, 4] >> 3, 0)
+    subtype = np.where(is_adsb, m[:, 4] & 0x7, 0)
+
+    # флаг чётности cpr (бит 54) для сообщений о положении
+    is_pos = is_adsb & (((tc >= 5) & (tc <= 18)) | ((tc >= 20) & (tc <= 22)))
+    oe_flag = np.where(is_pos, (m[:, 6] >> 2) & 0x1, 0)
+
+    return {
+        'df': df.astype(np.uint8),
+        'icao': icao,
+        'tc': tc.astype(np.uint8),
+        'subtype': subtype.astype(np.uint8),
+        'oe_flag': oe_flag.astype(np.uint8),
+    }
@@ -0,0 +1,50 @@
+import os
+import matplotlib
+from concurrent.futures import ProcessPoolExecutor
+
+# форматы файлов при сохранении графиков
+EXPORT_FORMATS = ('png', 'svg', 'pdf')
+
+# число групп бортов на один рабочий процесс (для равномерной загрузки)
+CHUNKS_PER_WORKER = 4
+
+# окно графиков процесса (без графического интерфейса)
+_plots = None
+
+# подготовка процесса: растровый бэкенд Agg вместо оконного и окно графиков по данным хранилища
+def _init_worker(store):
+    global _plots
+    matplotlib.use('Agg')
+    from icao_plots import IcaoPlots
+    _plots = IcaoPlots(store, interactive=False)
+
+# сохранение всех графиков и гистограмм группы бортов: <каталог>/<ICAO>/<режим>.<формат>
+def _export_icaos(task):
+    icaos, out_dir, fmt, dpi = task
+    # прореживание линий считается по размеру осей в пикселях сохраняемого файла
+    _plots.fig.set_dpi(dpi)
+    count = 0
+    for icao in icaos:
+        icao_dir = os.path.join(out_dir, icao)
+        os.makedirs(icao_dir, exist_ok=True)
+        for mode in _plots.graph_modes + _plots.hist_modes:
+            _plots.plot(icao, mode)
+            _plots.fig.savefig(os.path.join(icao_dir, f"{mode}.{fmt}"), format=fmt, dpi=dpi)
+            count += 1
+    return count
+
+# сохранение графиков всех бортов хранилища в файлы; борты делятся на группы,
+# которые рисуются в пуле из jobs процессов. возвращает число сохранённых файлов
+def export_plots(store, out_dir, fmt='png', dpi=100, jobs=1):
+    matplotlib.use('Agg')
+    icaos = sorted(store.icao_list)
+    n_chunks = max(min(len(icaos), jobs * CHUNKS_PER_WORKER), 1)
+    tasks = [(icaos[i::n_chunks], out_dir, fmt, dpi) for i in range(n_chunks)]
+
+    if jobs <= 1:
+        _init_worker(store)
+        return sum(_export_icaos(task) for task in tasks)
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(store,)) as pool:
+        return sum(pool.map(_export_icaos, tasks))
@@ -0,0 +1,91 @@
+import os
+import time
+import threading
+from parsing import parse_log_block
+from processing import process_record, update_commb
+
+# размер блока чтения файла (байт)
+READ_BLOCK = 1 << 20
+# период опроса файла при отсутствии новых данных (с)
+POLL_INTERVAL = 0.1
+# период обновления сводной таблицы в консоли (с)
+SUMMARY_INTERVAL = 10.0
+
+# фоновое чтение дописываемого файла логов:
+# новые строки обрабатываются по мере появления в то же хранилище данных по бортам
+class LogFollower(threading.Thread):
+    def __init__(self, store, file_path, target_icaos=None, on_summary=None,
+                 poll_interval=POLL_INTERVAL, summary_interval=SUMMARY_INTERVAL):
+        super().__init__(daemon=True)
+        self.store = store
+        self.file_path = file_path
+        self.target_icaos = target_icaos
+        self.on_summary = on_summary
+        self.poll_interval = poll_interval
+        self.summary_interval = summary_interval
+
+        # блокировка структур данных на время обработки и отрисовки
+        self.lock = threading.RLock()
+        # устанавливается, когда прочитано всё уже записанное содержимое файла
+        self.caught_up = threading.Event()
+        self.stopped = threading.Event()
+        # номер версии данных, увеличивается после каждой обработанной порции строк
+        self.version = 0
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        try:
+            self._follow()
+        finally:
+            # не оставляем главный поток в ожидании, если чтение прервалось
+            self.caught_up.set()
+
+    def _follow(self):
+        tail = b""
+        summary_version = 0
+        last_summary = time.monotonic()
+
+        with open(self.file_path, "rb") as f:
+            while not self.stopped.is_set():
+                data = f.read(READ_BLOCK)
+
+                if not data:
+                    # файл был усечён или перезаписан - данные прежнего содержимого
+                    # удаляются, файл читается заново с начала
+                    if os.path.getsize(self.file_path) < f.tell():
+                        f.seek(0)
+                        tail = b""
+                        with self.lock:
+                            self.store.clear()
+                            self.version += 1
+                        continue
+
+                    self.caught_up.set()
+
+                    # периодическое обновление сводной таблицы
+                    now = time.monotonic()
+                    if (self.on_summary and self.version != summary_version
+                            and now - last_summary >= self.summary_interval):
+                        with self.lock:
+                            self.on_summary()
+                        summary_version = self.version
+                        last_summary = now
+
+                    time.sleep(self.poll_interval)
+                    continue
+
+                # последняя неполная строка дочитывается при следующем чтении
+                data = tail + data
+                end = data.rfind(b"\n") + 1
+                tail = data[end:]
+                # борты (-a) выбираются при обработке: в ответах наблюдения (df 4/5/20/21)
+                # адреса в тексте нет
+                timestamps, messages = parse_log_block(data[:end])
+
+                with self.lock:
+                    for timestamp, message_str in zip(timestamps, messages):
+                        process_record(self.store, timestamp, message_str, self.target_icaos)
+                    update_commb(self.store)
+                    self.version += 1
@@ -1,67 +1,141 @@
 import numpy as np
+from contextlib import nullcontext
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
 from matplotlib.widgets import *
-from time_formatter import timestamp_to_utc
-from dict_data import *
+from aircraft_store import *
+from lru import LRUCache
+from time_formatter import to_datenums
+
+# число наборов данных (борт, режим), хранимых готовыми к отрисовке
+PLOT_CACHE_SIZE = 128
+
+# число точек временного графика на один пиксель ширины осей
+LOD_POINTS_PER_PIXEL = 2
+
+# прореживание упорядоченного по x ряда с сохранением минимума и максимума:
+# видимый диапазон [x0, x1] делится на n_bins интервалов, в каждом остаются точки
+# с наименьшим и наибольшим y, плюс крайние точки и по одной точке за краями диапазона.
+# возвращает индексы оставленных точек
+def minmax_indices(x, y, x0, x1, n_bins):
+    lo = max(np.searchsorted(x, x0) - 1, 0)
+    hi = min(np.searchsorted(x, x1, side='right') + 1, len(x))
+    if hi - lo <= 2 * n_bins or x1 <= x0:
+        return np.arange(lo, hi)
+
+    xs = x[lo:hi]
+    ys = y[lo:hi]
+    n = len(xs)
+    bins = np.clip(((xs - x0) / (x1 - x0) * n_bins).astype(np.int64), -1, n_bins)
+    # x упорядочен, поэтому точки одного интервала идут подряд
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    pos = np.arange(n)
+    keep = [[0, n - 1]]
+    for reduce in (np.minimum, np.maximum):
+        # первая точка интервала, на которой достигается экстремум
+        extreme = np.repeat(reduce.reduceat(ys, starts), counts)
+        keep.append(np.minimum.reduceat(np.where(ys == extreme, pos, n), starts))
+    keep = np.concatenate(keep)
+    return np.unique(keep[keep < n]) + lo
+
+# наибольшее число кодов ответчика, подписываемых на оси y по отдельности
+IDENTITY_MAX_TICKS = 20
+
+# режимы-карты: долгота и широта в равном масштабе
+MAP_MODES = ('track', 'reg09_tracks', 'track_angle', 'gs_spd_angle', 'airspd_angle')
+
+# гистограммы интервалов сообщений: ряд, описание сообщений, цвет, цвет крайних столбцов,
+# центр и отклонение (мс), число интервалов, заголовок ({} - борт)
+HIST_MODES = {
+    'reg05_hist': ('airborne_pos_ts', 'о местоположении в воздухе', 'blue', 'mediumblue', 500, 100, 15,
+                   'Распределение интервалов сообщений сквиттера '
+                   'местоположения в воздухе {} (REG05)'),
+    'reg06_1_hist': ('surface_pos_ts', 'о местоположении на земле при высокой частоте', 'red', 'firebrick', 500, 100, 15,
+                     'Распределение интервалов сообщений сквиттера '
+                     'местоположения на земле при высокой частоте {} (REG06)'),
+    'reg06_2_hist': ('surface_pos_ts', 'о местоположении на земле при низкой частоте', 'red', 'firebrick', 5000, 200, 15,
+                     'Распределение интервалов сообщений сквиттера '
+                     'местоположения на земле при низкой частоте {} (REG06)'),
+    'reg08_hist': ('ident_ts', 'об опознавательном коде и категории в полете', 'cyan', 'skyblue', 5000, 200, 15,
+                   'Распределение интервалов сообщений сквиттера '
+                   'опознавательного кода и категории {} (REG08)'),
+    'reg09_hist': ('spd_ts', 'о скорости при нахождении в воздухе', 'lime', 'mediumseagreen', 500, 100, 15,
+                   'Распределение интервалов сообщений сквиттера '
+                   'путевой скорости при нахождении в воздухе: {} (REG09)'),
+    'reg61_1_hist': ('status_ts', 'о статусе воздушного судна для', 'darkviolet', 'indigo', 5000, 200, 15,
+                     'Распределение интервалов сообщений сквиттера '
+                     'статуса {} (REG61)'),
+    'reg61_2_hist': ('emg_ts', 'о сигнале бедствия воздушного судна', 'darkviolet', 'indigo', 800, 100, 15,
+                     'Распределение интервалов сообщений сквиттера '
+                     'сигнала бедствия {} (REG61)'),
+    'reg61_3_hist': ('mode_a_ts', 'о статусe смены Mode A', 'darkviolet', 'indigo', 800, 100, 15,
+                     'Распределение интервалов сообщений сквиттера '
+                     'статуса передающей системы {} (REG61)'),
+    'reg61_4_hist': ('tcas_ts', 'о статусe передачи TCAS RA', 'darkviolet', 'indigo', 800, 100, 15,
+                     'Распределение интервалов сообщений сквиттера '
+                     'статуса TCAS RA {} (REG61)'),
+    'reg62_hist': ('target_state_ts', 'о состоянии и статусе цели', 'gold', 'darkorange', 1250, 50, 15,
+                   'Распределение интервалов сообщений сквиттера '
+                   'состояния и статуса цели {} (REG62)'),
+    'reg65_1_hist': ('air_op_status_ts', 'об эксплуатационном статусе в полете', 'mediumaquamarine', 'lightseagreen', 2500, 100, 15,
+                     'Распределение интервалов сообщений сквиттера '
+                     'эксплуатационного статуса в полете {} (REG65)'),
+    'reg65_2_hist': ('surf_op_status_ts', 'об эксплуатационном статусе на земле', 'mediumaquamarine', 'lightseagreen', 2500, 100, 15,
+                     'Распределение интервалов сообщений сквиттера '
+                     'эксплуатационного статуса на земле {} (REG65)'),
+    'df11_hist': ('acq_ts', 'об опознавании', 'orange', 'darkorange', 1000, 200, 15,
+                  'Распределение интервалов сообщений сквиттера '
+                  'опознавания {} (DF11)'),
+}
+
+# есть ли что показать в легенде для объекта отрисовки
+def has_legend_data(artist):
+    if not artist.get_visible():
+        return False
+    if isinstance(artist, Line2D):
+        return len(artist.get_xdata()) > 0
+    return True
 
 class IcaoPlots:
-    def __init__(self, alt_dict, spd_dict, pos_dict, course_dict, adsb_icao_list, icao_callsigns, 
-                 icao_sel_alt, icao_alt_diff, icao_baro_correction, icao_airborne_pos_ts, 
-                 icao_surface_pos_ts, icao_ident_ts, icao_speed_ts, icao_status, icao_emg_ts, 
-                 icao_mode_change, icao_tcas_ra, icao_target_state, icao_air_op_status, 
-                 icao_surf_op_status, icao_acq_ts, icao_track_angles, icao_gs_spd_ts, icao_airspd_ts):
+    # interactive=False - окно без кнопок и обработчиков событий, не показывается
+    # (сохранение графиков в файлы без графического интерфейса);
+    # decoder - отложенное декодирование бортов (LazyDecoder) при их показе
+    def __init__(self, store, follower=None, refresh_interval=0.5, blit=True, interactive=True,
+                 decoder=None):
         
-        self.icao_list = sorted(list(adsb_icao_list))
+        # хранилище данных по бортам
+        self.store = store
+        self.icao_list = sorted(list(store.icao_list))
         self.has_plot_data = False
 
-        # словари с данными
-        self.alt_dict = alt_dict
-        self.spd_dict = spd_dict
-        self.pos_dict = pos_dict
-        self.course_dict = course_dict
-        self.icao_callsigns = icao_callsigns
-        self.sel_alt_dict = icao_sel_alt or {}
-        self.alt_diff_dict = icao_alt_diff or {}
-        self.baro_correction_dict = icao_baro_correction or {} 
-        self.track_angle_dict = icao_track_angles or {}
-        self.icao_gs_spd_ts_dict = icao_gs_spd_ts or {}
-        self.icao_airspd_ts_dict = icao_airspd_ts or {}
-
-        # reg 05
-        self.icao_airborne_pos_ts = icao_airborne_pos_ts or {}
-        
-        # reg 06
-        self.icao_surface_pos_ts = icao_surface_pos_ts or {}
-                
-        # reg 08
-        self.icao_ident_ts = icao_ident_ts or {}
-
-        # reg 09
-        self.icao_speed_ts = icao_speed_ts or {}
-
-        # reg 61
-        self.icao_status = icao_status or {}
-        self.icao_emg_ts = icao_emg_ts or {}
-        self.icao_mode_change = icao_mode_change or {}
-        self.icao_tcas_ra = icao_tcas_ra or {}
-
-        # reg 62
-        self.icao_target_state = icao_target_state or {}
-        
-        # reg 65
-        self.icao_air_op_status = icao_air_op_status or {}
-        self.icao_surf_op_status = icao_surf_op_status or {}
-
-        # df 11
-        self.icao_df11_ts = icao_acq_ts or {}
-
         self.icao_index = 0
+
+        # режим слежения за файлом или отложенного декодирования:
+        # данные дополняются в фоновом потоке
+        self.follower = follower or decoder
+        self.decoder = decoder
+        self.lock = self.follower.lock if self.follower else nullcontext()
+        self.drawn_version = self.follower.version if self.follower else 0
+
+        # готовые к отрисовке массивы по (борт, режим), строятся при первом просмотре
+        self.plot_cache = LRUCache(PLOT_CACHE_SIZE)
+        # полные массивы прореженных линий: линия -> (x, y)
+        self.lod_data = {}
+        # оси и постоянные объекты отрисовки каждого режима, создаются при первом показе;
+        # при смене борта у них обновляются только данные
+        self.views = {}
+        # показанные борт и режим
+        self.shown = None
         
         # список доступных режимов (типов графиков и гистограмм)
         self.graph_modes = ['altitude', 'speed', 'altitude_speed_combined', 
                            'latitude', 'course', 'track', 'altitude_diff', 'baro_correction',
-                           'reg09_tracks', 'track_angle', 'airspd_angle']
+                           'reg09_tracks', 'track_angle', 'airspd_angle', 'identity',
+                           'bds40_selected_altitude', 'bds50_roll', 'bds50_tas', 'bds60_heading',
+                           'bds60_ias_mach']
         
         self.hist_modes = ['reg05_hist', 'reg06_1_hist', 'reg06_2_hist', 'reg08_hist', 
                            'reg09_hist', 'reg61_1_hist', 'reg61_2_hist', 'reg61_3_hist', 
@@ -78,21 +152,35 @@ class IcaoPlots:
             'altitude': (-1200, 40000), 
             'speed': (0, 500), 
             'course': (0, 360), 
-            'track_angle': (0, 360),
             'latitude': 'auto',
             'altitude_speed_combined': (0, 40000),
             'altitude_diff': (-2000, 2000),
-            'baro_correction': (950, 1050)
+            'baro_correction': (950, 1050),
+            'bds50_roll': (-40, 40),
+            'bds60_heading': (0, 360)
         }
 
-        # окно и основная области для рисования (осей)
-        self.fig, self.ax = plt.subplots(figsize=(13, 7))
+        # окно; области для рисования (осей) создаются для каждого режима
+        self.fig = plt.figure(figsize=(13, 7))
+        
+        # оси текущего режима и правая ось y комбинированного графика
+        self.ax = None
+        self.ax2 = None
+
+        # блиттинг: оси графиков рисуются поверх сохранённого фона окна,
+        # остальное окно (кнопки) при смене графика не перерисовывается
+        self.blit = blit and interactive and self.fig.canvas.supports_blit
+        self.background = None
+        self.background_bounds = None
+
+        self.interactive = interactive
+        if not interactive:
+            return
+
         self.fig.canvas.manager.set_window_title('Графики бортов')
         # пространство для кнопок
         plt.subplots_adjust(left=0.25, bottom=0.25) 
-        
-        # атрибут для хранения ссылки на правую ось y
-        self.ax2 = None
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
 
         # области для кнопок
         ax_prev_icao = plt.axes([0.05, 0.05, 0.2, 0.075])
@@ -120,9 +208,18 @@ class IcaoPlots:
         # подключение обработчиков событий клавиатуры и колеса мыши к окну
         self.fig.canvas.mpl_connect('key_press_event', self.on_key)
         self.fig.canvas.mpl_connect('scroll_event', self.on_scroll)
+        # при изменении размера окна прореженные графики пересчитываются
+        self.fig.canvas.mpl_connect('resize_event', lambda event: self._update_lod())
         
         # первоначальная отрисовка графика
         self.plot_current()
+
+        # периодическая перерисовка при поступлении новых данных
+        if self.follower:
+            self.timer = self.fig.canvas.new_timer(interval=int(refresh_interval * 1000))
+            self.timer.add_callback(self.refresh)
+            self.timer.start()
+
         # запуск окна
         plt.show()
 
@@ -134,36 +231,374 @@ class IcaoPlots:
             )
             self.has_plot_data = False
 
+    # столбцы ряда текущего борта, упорядоченные по времени
+    def _sorted_series(self, name, icao):
+        columns = self.store.get(name, icao)
+        order = np.argsort(columns[0], kind='stable')
+        return tuple(c[order] for c in columns)
+
+    # данные режима для борта из кэша; build строит их при первом обращении
+    def _cached(self, icao, mode, build):
+        key = (icao, mode)
+        data = self.plot_cache.get(key)
+        if data is None:
+            data = build()
+            self.plot_cache.put(key, data)
+        return data
+
+    # ряд, упорядоченный по времени, с временем в числах дат matplotlib
+    def _dated_series(self, name, icao):
+        columns = self._sorted_series(name, icao)
+        return (to_datenums(columns[0]),) + columns[1:]
+
+    # баро и GNSS высоты по отдельности, выбранная высота и высота из ответов наблюдения
+    def _altitude_data(self, icao):
+        alt_t, alt_values, alt_source = self._dated_series('altitude', icao)
+        baro = alt_source == ALT_BARO
+        gnss = alt_source == ALT_GNSS
+        return (alt_t[baro], alt_values[baro], alt_t[gnss], alt_values[gnss],
+                *self._dated_series('selected_altitude', icao),
+                *self._dated_series('surv_altitude', icao))
+
+    # координаты в моменты всех сообщений TC 19 (интерполяция между соседними точками)
+    def _tc19_track_data(self, icao):
+        tc19_times = np.sort(self.store.get('spd_ts', icao)[0])
+        return self.store.position_index(icao).interpolate(tc19_times)
+
+    # концы линий длиной vector_length от точек трека в направлении угла;
+    # nearest - ближайшая точка трека вместо интерполяции
+    def _angle_vectors(self, name, icao, nearest=False, vector_length=0.05):
+        t, angles = self.store.get(name, icao)
+        order = np.argsort(t, kind='stable')
+        positions = self.store.position_index(icao)
+        if nearest:
+            lats, lons, _ = positions.nearest(t[order])
+        else:
+            lats, lons = positions.interpolate(t[order])
+        rad = np.radians(90 - angles[order].astype(np.float64))
+        return lons, lats, lons + np.cos(rad) * vector_length, lats + np.sin(rad) * vector_length
+
+    # интервалы между сообщениями ряда (мс)
+    def _intervals(self, name, icao):
+        timestamps = np.sort(self.store.get(name, icao)[0])
+        # точная разность целых наносекунд, затем перевод в мс
+        intervals = np.diff(timestamps) / 1e6
+        return intervals[intervals >= 0]
+
+    # число интервалов прореживания по ширине осей в пикселях
+    def _lod_bins(self, ax):
+        return max(int(ax.bbox.width * LOD_POINTS_PER_PIXEL / 2), 1)
+
+    # данные линии временного графика, прореженные до ширины осей в пикселях;
+    # полные массивы сохраняются для пересчёта при изменении видимого диапазона
+    def _set_lod_data(self, line, x, y):
+        self.lod_data[line] = (x, y)
+        idx = minmax_indices(x, y, x[0], x[-1], self._lod_bins(line.axes)) if len(x) else np.arange(0)
+        line.set_data(x[idx], y[idx])
+
+    # пересчёт прореженных линий показанных осей (или только осей axes)
+    # по видимому диапазону оси x
+    def _update_lod(self, axes=None):
+        for line, (x, y) in self.lod_data.items():
+            ax = line.axes
+            if len(x) == 0 or not ax.get_visible() or axes not in (None, ax):
+                continue
+            x0, x1 = ax.get_xlim()
+            idx = minmax_indices(x, y, x0, x1, self._lod_bins(ax))
+            line.set_data(x[idx], y[idx])
+
+    # оси режима с объектами отрисовки (создаются один раз)
+    def _view(self, mode):
+        view = self.views.get(mode)
+        if view is None:
+            view = self.views[mode] = self._create_view(mode)
+        return view
+
+    # новая ось в области графиков: скрыта до показа режима, при блиттинге
+    # не входит в фон окна и рисуется отдельно
+    def _add_axes(self, ax):
+        ax.set_visible(False)
+        ax.set_animated(self.blit)
+        return ax
+
+    # создание осей режима и объектов отрисовки без данных.
+    # view['artists'] - объекты, видимые только при наличии данных,
+    # view['legend'] - объекты-кандидаты для легенды
+    def _create_view(self, mode):
+        ax = self._add_axes(self.fig.add_subplot(111))
+        fontsize = 15 if mode in HIST_MODES else None
+        view = {
+            'ax': ax, 'ax2': None, 'artists': [], 'legend': [],
+            # сообщение об отсутствии данных
+            'message': ax.text(0.5, 0.5, "", ha='center', va='center', fontsize=fontsize,
+                               transform=ax.transAxes),
+        }
+
+        # линия без данных, видимая только при наличии данных
+        def line(name, *args, axes=ax, legend=True, **kwargs):
+            view[name], = axes.plot([], [], *args, **kwargs)
+            view['artists'].append(view[name])
+            if legend:
+                view['legend'].append(view[name])
+            return view[name]
+
+        # временные графики
+        if mode == 'altitude':
+            ax.set_ylabel("Высота (футы)")
+            line('baro', 'o-', markersize=3, label='Барометрическая высота', color='blue')
+            line('gnss', 's-', markersize=4, label='GNSS высота', color='cyan', alpha=0.7)
+            line('selected', drawstyle='steps-post', label='Выбранная высота', color='red', linestyle='--')
+            line('surveillance', 'x', markersize=4, label='Высота Mode S (DF 4/20)', color='gray')
+
+        elif mode == 'speed':
+            ax.set_ylabel("Скорость (узлы)")
+            line('line', 'o-', markersize=3, label='Скорость', color='green')
+
+        elif mode == 'altitude_speed_combined':
+            # левая ось y для высоты
+            ax.set_ylabel("Высота (футы)", color='blue')
+            ax.tick_params(axis='y', labelcolor='blue')
+            # правая ось y для скорости
+            ax2 = view['ax2'] = self._add_axes(ax.twinx())
+            ax2.set_ylabel("Скорость (узлы)", color='green')
+            ax2.tick_params(axis='y', labelcolor='green')
+            line('altitude', 'o-', markersize=3, label='Высота', color='blue')
+            line('speed', 'o-', axes=ax2, markersize=3, label='Скорость', color='green')
+
+        elif mode == 'latitude':
+            ax.set_ylabel("Широта (°)")
+            line('line', 'o-', markersize=3, label='Широта', color='orange')
+
+        elif mode == 'course':
+            ax.set_ylabel("Курс (°)")
+            line('line', 'o-', markersize=3, label='Курс', color='purple')
+
+        elif mode == 'altitude_diff':
+            ax.set_ylabel("Разница высот (футы)")
+            line('line', 'o-', markersize=3, label='Разница высот (выбранная - барометрическая)', color='red')
+            view['zero'] = ax.axhline(y=0, color='gray', linestyle='--', alpha=0.7, label='Нулевая разница')
+            view['artists'].append(view['zero'])
+            view['legend'].append(view['zero'])
+
+        elif mode == 'baro_correction':
+            ax.set_ylabel("Давление (гПа)")
+            line('line', 'o-', markersize=3, label='Барокоррекция', color='brown')
+            view['standard'] = ax.axhline(y=1013.25, color='green', linestyle='--', alpha=0.7,
+                                          label='Стандартное давление (1013.25 гПа)')
+            view['artists'].append(view['standard'])
+            view['legend'].append(view['standard'])
+
+        elif mode == 'identity':
+            ax.set_ylabel("Код ответчика")
+            line('line', 'o-', markersize=3, drawstyle='steps-post', label='Код Mode A (DF 5/21)',
+                 color='darkviolet')
+            # коды - четыре восьмеричные цифры
+            ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda y, _: f"{int(round(y)):04d}"))
+
+        # регистры comm-b (ответы df 20/21)
+        elif mode == 'bds40_selected_altitude':
+            ax.set_ylabel("Высота (футы)")
+            line('line', drawstyle='steps-post', label='Выбранная высота (BDS 4,0)', color='red')
+            line('adsb', drawstyle='steps-post', label='Выбранная высота ADS-B (TC 29)', color='gray',
+                 linestyle='--')
+
+        elif mode == 'bds50_roll':
+            ax.set_ylabel("Крен (°)")
+            line('line', 'o-', markersize=3, label='Крен (BDS 5,0), + правое крыло вниз', color='teal')
+            view['zero'] = ax.axhline(y=0, color='gray', linestyle='--', alpha=0.7)
+            view['artists'].append(view['zero'])
+
+        elif mode == 'bds50_tas':
+            ax.set_ylabel("Скорость (узлы)")
+            line('line', 'o-', markersize=3, label='Истинная скорость (BDS 5,0)', color='darkgreen')
+            line('adsb', '-', label='Путевая скорость ADS-B', color='lime', alpha=0.7)
+
+        elif mode == 'bds60_heading':
+            ax.set_ylabel("Угол (°)")
+            line('line', 'o', markersize=3, label='Магнитный курс (BDS 6,0)', color='blue')
+            line('adsb', 'o', markersize=2, label='Путевой угол ADS-B', color='orange', alpha=0.5)
+
+        elif mode == 'bds60_ias_mach':
+            # левая ось y - приборная скорость, правая - число маха
+            ax.set_ylabel("Приборная скорость (узлы)", color='purple')
+            ax.tick_params(axis='y', labelcolor='purple')
+            ax2 = view['ax2'] = self._add_axes(ax.twinx())
+            ax2.set_ylabel("Число Маха", color='darkred')
+            ax2.tick_params(axis='y', labelcolor='darkred')
+            line('ias', 'o-', markersize=3, label='Приборная скорость (BDS 6,0)', color='purple')
+            line('mach', 'o-', axes=ax2, markersize=3, label='Число Маха (BDS 6,0)', color='darkred')
+
+        # карты
+        elif mode == 'track':
+            line('line', 'o', markersize=2, label='Трек')
+
+        elif mode == 'reg09_tracks':
+            line('line', 'o-', color='lime', linewidth=2, markersize=4)
+
+        elif mode == 'track_angle':
+            line('track', '-', color='limegreen', linewidth=4, alpha=0.5, label='Полный трек')
+            # линия и надпись показываются в зависимости от наличия углов
+            view['angle'], = ax.plot([], [], '-', color='red', linewidth=1.5)
+            view['legend'].append(view['angle'])
+            view['note'] = ax.text(0.5, 0.5, "Нет данных путевого угла для наложения", ha='center',
+                                   transform=ax.transAxes)
+
+        elif mode == 'airspd_angle':
+            line('track', '-', color='lime', linewidth=4, alpha=0.5, label='Полный трек')
+            # все векторы курса одним объектом отрисовки
+            view['vectors'] = ax.add_collection(LineCollection([], colors='blue', linewidths=1.5))
+            view['legend'].append(view['vectors'])
+            view['note'] = ax.text(0.5, 0.1, "Нет данных для наложения магнитного курса", ha='center',
+                                   transform=ax.transAxes)
+
+        # гистограммы: столбцы создаются с нулевой высотой
+        elif mode in HIST_MODES:
+            _, _, color, bar_color, center, dev, num_bins, _ = HIST_MODES[mode]
+            low = center - dev
+            high = center + dev
+            bar_width = (high - low) / num_bins
+
+            view['bin_edges'] = np.concatenate(([0], np.linspace(low, high, num_bins + 1)))
+            _, _, view['middle'] = ax.hist([], bins=view['bin_edges'], alpha=0.6, color=color,
+                                           edgecolor='black')
+            view['left'] = ax.bar(low - bar_width, 0, width=bar_width, align='edge',
+                                  color=bar_color, edgecolor='black')
+            view['right'] = ax.bar(high, 0, width=bar_width, align='edge',
+                                   color=bar_color, edgecolor='black')
+            for container in (view['middle'], view['left'], view['right']):
+                view['artists'].extend(container)
+
+            ax.set_xlim(low - bar_width, high + bar_width)
+            view['artists'].append(ax.axvline(low, linestyle='--', color='black', alpha=0.8))
+            view['artists'].append(ax.axvline(high, linestyle='--', color='black', alpha=0.8))
+            ax.set_xlabel('Интервал между сообщениями (мс)')
+            ax.set_ylabel('Количество')
+            view['stats'] = ax.text(0.02, 0.98, "", transform=ax.transAxes, ha='left', va='top',
+                                    bbox=dict(facecolor='white', alpha=0.8))
+            view['artists'].append(view['stats'])
+            ax.grid(True, linestyle='--', alpha=0.7)
+
+        # общие настройки карт: равномасштабные оси
+        if mode in MAP_MODES:
+            ax.set_aspect('equal', adjustable='datalim')
+            ax.set_xlabel("Долгота (°)")
+            ax.set_ylabel("Широта (°)")
+            ax.grid(True, linestyle='--', alpha=0.7)
+
+        # общие настройки временных графиков
+        elif mode in self.graph_modes:
+            ax.set_xlabel("Время (UTC)")
+            # время передаётся числами дат matplotlib
+            ax.xaxis_date()
+            ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S.%f'))
+            # при масштабировании и сдвиге графики прореживаются заново
+            # (у правой оси y свой вызов: общие пределы x ей передаются позже)
+            for axes in (ax, view['ax2']):
+                if axes is not None:
+                    axes.callbacks.connect('xlim_changed', self._update_lod)
+            ax.grid(True, linestyle='--', alpha=0.7)
+
+        return view
+
+    # показ осей режима, оси остальных режимов скрываются
+    def _show_view(self, view):
+        for other in self.views.values():
+            for ax in (other['ax'], other['ax2']):
+                if ax is not None:
+                    ax.set_visible(other is view)
+        self.ax = view['ax']
+        self.ax2 = view['ax2']
+
+    # отрисовка осей текущего режима
+    def _draw_view(self, renderer):
+        for ax in (self.ax, self.ax2):
+            if ax is not None:
+                ax.draw(renderer)
+
+    # после полной перерисовки окна сохраняется фон без осей графиков
+    # и поверх него рисуются оси текущего режима
+    def _on_draw(self, event):
+        if not self.blit:
+            return
+        if hasattr(event.canvas, 'copy_from_bbox'):
+            self.background = event.canvas.copy_from_bbox(self.fig.bbox)
+            self.background_bounds = self.fig.bbox.bounds
+        self._draw_view(event.renderer)
+
+    # перерисовка графика: при блиттинге перерисовываются только оси текущего режима,
+    # иначе (или если фона ещё нет либо размер окна изменился) - всё окно
+    def _redraw(self):
+        # без окна рисование выполняется только при сохранении в файл
+        if not self.interactive:
+            return
+        canvas = self.fig.canvas
+        if self.blit and self.background is not None and self.background_bounds == self.fig.bbox.bounds:
+            canvas.restore_region(self.background)
+            self._draw_view(canvas.get_renderer())
+            canvas.blit(self.fig.bbox)
+        else:
+            canvas.draw_idle()
+
     # отрисовка текущего графика, вызывается при любом изменении
     def plot_current(self):
-        # удаляем вторую ось y, если она осталась от предыдущего графика
-        if self.ax2:
-            self.ax2.remove()
-            self.ax2 = None
-        # полностью очищаем основную область рисования
-        self.ax.clear()
-        
-        # принудительно сбрасываем соотношение сторон к стандартному ('auto')
-        self.ax.set_aspect('auto')
+        with self.lock:
+            self._plot_current()
+
+    # обновление списка бортов и графика, если фоновый поток добавил данные
+    def refresh(self):
+        if self.follower.version == self.drawn_version:
+            return
+        with self.lock:
+            self.drawn_version = self.follower.version
+            # данные бортов изменились - готовые массивы строятся заново
+            self.plot_cache.clear()
+            # сохраняем выбранный борт при изменении списка
+            current = self.icao_list[self.icao_index] if self.icao_list else None
+            self.icao_list = sorted(list(self.store.icao_list))
+            if current in self.icao_list:
+                self.icao_index = self.icao_list.index(current)
+            else:
+                # борт пропал (файл перезаписан) - номер в пределах нового списка
+                self.icao_index = min(self.icao_index, max(len(self.icao_list) - 1, 0))
+            self._plot_current()
 
+    def _plot_current(self):
         # если нет данных
         if not self.icao_list:
-            self.ax.text(
-                0.5, 0.5, 
-                "Нет бортов с данными для отображения", 
-                ha='center', va='center'
-            )
-            self.fig.canvas.draw_idle()
+            self._show_message("Нет бортов с данными для отображения")
             return
         
         # текущий выбранный icao и режим (тип графика)
         icao = self.icao_list[self.icao_index]
-        mode = self.plot_modes[self.plot_mode_idx]
-        
+
+        # текущий и соседние борты декодируются в фоновом потоке;
+        # график строится после декодирования при обновлении по версии данных
+        if self.decoder:
+            self.decoder.request_around(self.icao_list, self.icao_index)
+            if icao in self.store.undecoded:
+                self._show_message(f"Декодирование данных борта {icao}...")
+                return
+
+        self._plot(icao, self.plot_modes[self.plot_mode_idx])
+
+    # сообщение вместо графика
+    def _show_message(self, text):
+        view = self._view(None)
+        self._show_view(view)
+        view['message'].set_text(text)
+        self.ax.set_axis_off()
+        self.has_plot_data = False
+        self._redraw()
+
+    # отрисовка графика режима mode для борта icao (без переключения текущих)
+    def plot(self, icao, mode):
+        with self.lock:
+            self._plot(icao, mode)
+
+    def _plot(self, icao, mode):
         # заголовок с позывным и активными режимами автопилота
-        callsign = self.icao_callsigns.get(icao, "N/A")
-        modes_key = f"{icao}_modes"
-        active_modes = self.icao_callsigns.get(modes_key, set())
+        callsign = self.store.callsigns.get(icao, "N/A")
+        active_modes = self.store.modes.get(icao, set())
 
         if active_modes:
             mode_str = f" ({', '.join(sorted(active_modes))})"
@@ -174,618 +609,314 @@ class IcaoPlots:
             display_id = f"{callsign} ({icao}){mode_str}"
         else:
             display_id = f"{icao}{mode_str}"
-        
-        # переменные для подписей
-        data = None
-        label = ""
+
+        view = self._view(mode)
+        self._show_view(view)
+        self._update_view(view, mode, icao, display_id)
+
+        # при смене борта или режима сбрасывается история масштабов панели инструментов
+        if self.shown != (icao, mode):
+            self.shown = (icao, mode)
+            toolbar = self.fig.canvas.toolbar
+            if toolbar is not None:
+                toolbar.update()
+
+        # перерисовка окна с обновлённым графиком
+        self._redraw()
+
+    # обновление данных объектов отрисовки режима для борта
+    def _update_view(self, view, mode, icao, display_id):
+        ax = view['ax']
+        ax2 = view['ax2']
+
+        # переменные для подписей; message - текст при отсутствии данных
         title = ""
+        message = None
 
-        # блок отрисовки графика высоты
+        # блок графика высоты
         if mode == 'altitude':
             # получаем данные о высоте для текущего icao
-            data = self.alt_dict.get(icao, [])
-            sel_data = self.sel_alt_dict.get(icao, []) 
-            title, label = f"Высота: {display_id}", "Высота (футы)"
+            (baro_times, baro_values, gnss_times, gnss_values,
+             sel_t, sel_values, surv_t, surv_values) = self._cached(icao, mode, lambda: self._altitude_data(icao))
+            title = f"Высота: {display_id}"
+            self._set_lod_data(view['baro'], baro_times, baro_values)
+            self._set_lod_data(view['gnss'], gnss_times, gnss_values)
+            view['selected'].set_data(sel_t, sel_values)
+            self._set_lod_data(view['surveillance'], surv_t, surv_values)
             # если данных нет, выводим сообщение
-            if not data and not sel_data:
-                self.ax.text(0.5, 0.5, f"Нет данных о высоте для борта {icao}", ha='center', va='center')
-                self.has_plot_data = False
-            else:
-                # баро и GNSS высоты
-                baro_times, baro_values = [], []
-                gnss_times, gnss_values = [], []
-                
-                for t, v, alt_type in sorted(data):
-                    if alt_type == 'baro':
-                        baro_times.append(timestamp_to_utc(t))
-                        baro_values.append(v)
-                    elif alt_type == 'gnss':
-                        gnss_times.append(timestamp_to_utc(t))
-                        gnss_values.append(v)
-                
-                # отрисовка баро высоты
-                if baro_times:
-                    self.ax.plot(baro_times, baro_values, 'o-', markersize=3, 
-                                label='Барометрическая высота', color='blue')
-                
-                # отрисовка GNSS высоты
-                if gnss_times:
-                    self.ax.plot(gnss_times, gnss_values, 's-', markersize=4, 
-                                label='GNSS высота', color='cyan', alpha=0.7)
-                
-                # отрисовка выбранной высоты
-                if sel_data:
-                    times = [timestamp_to_utc(t) for t, v in sorted(sel_data)]
-                    values = [v for t, v in sorted(sel_data)]
-                    self.ax.step(times, values, where='post', label='Выбранная высота', 
-                                color='red', linestyle='--')
-                
-                self.has_plot_data = True
+            if len(baro_times) == 0 and len(gnss_times) == 0 and len(sel_t) == 0 and len(surv_t) == 0:
+                message = f"Нет данных о высоте для борта {icao}"
         
-        # блок отрисовки графика скорости
+        # блок графика скорости
         elif mode == 'speed':
-            data = self.spd_dict.get(icao, [])
-            title, label = f"Скорость: {display_id}", "Скорость (узлы)"
-            if not data:
-                self.ax.text(0.5, 0.5, f"Нет данных о скорости для борта {icao}", ha='center', va='center')
-                self.has_plot_data = False
-            else:
-                times = [timestamp_to_utc(t) for t, v in sorted(data)]
-                values = [v for t, v in sorted(data)]
-                self.ax.plot(times, values, 'o-', markersize=3, label='Скорость', color='green')
-                self.has_plot_data = True
+            t, values = self._cached(icao, mode, lambda: self._dated_series('speed', icao))
+            title = f"Скорость: {display_id}"
+            self._set_lod_data(view['line'], t, values)
+            if len(t) == 0:
+                message = f"Нет данных о скорости для борта {icao}"
 
         # комбинированный график высоты и скорости
         elif mode == 'altitude_speed_combined':
             title = f"Высота и скорость: {display_id}"
-            alt_data = self.alt_dict.get(icao)
-            spd_data = self.spd_dict.get(icao)
-            
-            if not alt_data and not spd_data:
-                self.ax.text(0.5, 0.5, f"Нет данных о высоте и скорости для борта {icao}", ha='center', va='center')
-                self.has_plot_data = False
-            else:
-                # настройка левой оси y для высоты
-                self.ax.set_ylabel("Высота (футы)", color='blue')
-                self.ax.tick_params(axis='y', labelcolor='blue')
-                self.ax.set_ylim(0, 40000)
-                # создание и настройка правой оси y для скорости
-                self.ax2 = self.ax.twinx() # создаём и сохраняем вторую ось
-                self.ax2.set_ylabel("Скорость (узлы)", color='green')
-                self.ax2.tick_params(axis='y', labelcolor='green')
-                self.ax2.set_ylim(0, 500)
-
-                # отрисовка данных и сбор информации для общей легенды
-                lines1, labels1, lines2, labels2 = [], [], [], []
-                if alt_data:
-                    alt_times = []
-                    alt_values = []
-                    for t, v, alt_type in sorted(alt_data):
-                        alt_times.append(timestamp_to_utc(t))
-                        alt_values.append(v)
-                    line, = self.ax.plot(alt_times, alt_values, 'o-', markersize=3, label='Высота', color='blue')
-                    lines1.append(line)
-                    labels1.append('Высота')
-                if spd_data:
-                    spd_times = [timestamp_to_utc(t) for t, v in sorted(spd_data)]
-                    spd_values = [v for t, v in sorted(spd_data)]
-                    line, = self.ax2.plot(spd_times, spd_values, 'o-', markersize=3, label='Скорость', color='green')
-                    lines2.append(line)
-                    labels2.append('Скорость')
-                
-                # создание общей легенды для обеих осей
-                self.ax.legend(lines1 + lines2, labels1 + labels2, loc='upper left')
+            (alt_t, alt_values, _), (spd_t, spd_values) = self._cached(
+                icao, mode, lambda: (self._dated_series('altitude', icao), self._dated_series('speed', icao)))
+            self._set_lod_data(view['altitude'], alt_t, alt_values)
+            self._set_lod_data(view['speed'], spd_t, spd_values)
+            if len(alt_t) == 0 and len(spd_t) == 0:
+                message = f"Нет данных о высоте и скорости для борта {icao}"
 
         # график широты
         elif mode == 'latitude':
-            data = self.pos_dict.get(icao, [])
-            title, label = f"Координаты: {display_id}", "Широта (°)"
-            if not data:
-                self.ax.text(0.5, 0.5, f"Нет данных о координатах для борта {icao}", ha='center', va='center')
-                self.has_plot_data = False
-            else:
-                times = [timestamp_to_utc(t) for t, lat, lon in data]
-                lats = [lat for t, lat, lon in data]
-                self.ax.plot(times, lats, 'o-', markersize=3, label='Широта', color='orange')
-                self.has_plot_data = True
+            t, lats, lons = self._cached(icao, mode, lambda: self._dated_series('positions', icao))
+            title = f"Координаты: {display_id}"
+            self._set_lod_data(view['line'], t, lats)
+            if len(t) == 0:
+                message = f"Нет данных о координатах для борта {icao}"
 
         # график курса
         elif mode == 'course':
-            data = self.course_dict.get(icao, [])
-            title, label = f"Курс: {display_id}", "Курс (°)"
-            if not data:
-                self.ax.text(
-                    0.5, 0.5, 
-                    f"Нет данных о курсе для борта {icao}", 
-                    ha='center', va='center'
-                )
-                self.has_plot_data = False
-            else:
-                times = [timestamp_to_utc(t) for t, v in sorted(data)]
-                values = [v for t, v in sorted(data)]
-                self.ax.plot(times, values, 'o-', markersize=3, label='Курс', color='purple')
-                self.has_plot_data = True
+            t, values = self._cached(icao, mode, lambda: self._dated_series('courses', icao))
+            title = f"Курс: {display_id}"
+            self._set_lod_data(view['line'], t, values)
+            if len(t) == 0:
+                message = f"Нет данных о курсе для борта {icao}"
 
         # трек полёта (карта)
         elif mode == 'track':
-            data = self.pos_dict.get(icao, [])
+            t, lats, lons = self.store.get('positions', icao)
             title = f"Схема трека полёта: {display_id}"
-            if not data:
-                self.ax.text(0.5, 0.5, f"Нет данных о координатах для борта {icao}", ha='center', va='center')
-                self.has_plot_data = False
-            else:
-                lons = [lon for t, lat, lon in data]
-                lats = [lat for t, lat, lon in data]
-                self.ax.plot(lons, lats, 'o', markersize=2, label='Трек')
+            view['line'].set_data(lons, lats)
+            if len(t) == 0:
+                message = f"Нет данных о координатах для борта {icao}"
 
         # график разницы высот
         elif mode == 'altitude_diff':
-            data = self.alt_diff_dict.get(icao, [])
-            title, label = f"Разница высот (DIF_FROM_BARO_ALT): {display_id}", "Разница высот (футы)"
-            
-            if not data:
-                self.ax.text(0.5, 0.5, f"Нет данных о разнице высот для борта {icao}", ha='center', va='center')
-                self.has_plot_data = False
-            else:
-                times = [timestamp_to_utc(t) for t, v in sorted(data)]
-                values = [v for t, v in sorted(data)]
-                self.ax.plot(times, values, 'o-', markersize=3, label='Разница высот (выбранная - барометрическая)', color='red')
-                self.ax.axhline(y=0, color='gray', linestyle='--', alpha=0.7, label='Нулевая разница')
-                self.has_plot_data = True
+            t, values = self._cached(icao, mode, lambda: self._dated_series('altitude_difference', icao))
+            title = f"Разница высот (DIF_FROM_BARO_ALT): {display_id}"
+            self._set_lod_data(view['line'], t, values)
+            if len(t) == 0:
+                message = f"Нет данных о разнице высот для борта {icao}"
 
         # график барокоррекции
         elif mode == 'baro_correction':
-            data = self.baro_correction_dict.get(icao, [])
-            title, label = f"Барокоррекция: {display_id}", "Давление (гПа)"
-            
-            if not data:
-                self.ax.text(0.5, 0.5, f"Нет данных о барокоррекции для борта {icao}", ha='center', va='center')
-                self.has_plot_data = False
+            t, values = self._cached(icao, mode, lambda: self._dated_series('baro_correction', icao))
+            title = f"Барокоррекция: {display_id}"
+            self._set_lod_data(view['line'], t, values)
+            if len(t) == 0:
+                message = f"Нет данных о барокоррекции для борта {icao}"
+
+        # график кода ответчика из ответов наблюдения
+        elif mode == 'identity':
+            t, values = self._cached(icao, mode, lambda: self._dated_series('surv_identity', icao))
+            title = f"Код ответчика (DF 5/21): {display_id}"
+            view['line'].set_data(t, values)
+            # деления оси y - только переданные коды (промежуточные значения - не коды)
+            codes = np.unique(values)
+            if len(codes) <= IDENTITY_MAX_TICKS:
+                ax.set_yticks(codes)
             else:
-                times = [timestamp_to_utc(t) for t, v in sorted(data)]
-                values = [v for t, v in sorted(data)]
-                self.ax.plot(times, values, 'o-', markersize=3, label='Барокоррекция', color='brown')
-                self.ax.axhline(y=1013.25, color='green', linestyle='--', alpha=0.7, label='Стандартное давление (1013.25 гПа)')
-                self.has_plot_data = True
+                ax.yaxis.set_major_locator(plt.MaxNLocator(integer=True))
+            if len(t) == 0:
+                message = f"Нет ответов с кодом ответчика для борта {icao}"
+
+        # графики регистров comm-b; для сравнения - соответствующие данные ads-b
+        elif mode == 'bds40_selected_altitude':
+            (t, values), (adsb_t, adsb_values) = self._cached(
+                icao, mode, lambda: (self._dated_series('bds40_selected_altitude', icao),
+                                     self._dated_series('selected_altitude', icao)))
+            title = f"Выбранная высота (BDS 4,0): {display_id}"
+            view['line'].set_data(t, values)
+            view['adsb'].set_data(adsb_t, adsb_values)
+            if len(t) == 0:
+                message = f"Нет данных BDS 4,0 для борта {icao}"
+
+        elif mode == 'bds50_roll':
+            t, values = self._cached(icao, mode, lambda: self._dated_series('bds50_roll', icao))
+            title = f"Крен (BDS 5,0): {display_id}"
+            self._set_lod_data(view['line'], t, values)
+            if len(t) == 0:
+                message = f"Нет данных BDS 5,0 для борта {icao}"
+
+        elif mode == 'bds50_tas':
+            (t, values), (gs_t, gs_values) = self._cached(
+                icao, mode, lambda: (self._dated_series('bds50_tas', icao), self._dated_series('speed', icao)))
+            title = f"Истинная скорость (BDS 5,0): {display_id}"
+            self._set_lod_data(view['line'], t, values)
+            self._set_lod_data(view['adsb'], gs_t, gs_values)
+            if len(t) == 0:
+                message = f"Нет данных BDS 5,0 для борта {icao}"
+
+        elif mode == 'bds60_heading':
+            (t, values), (trk_t, trk_values) = self._cached(
+                icao, mode, lambda: (self._dated_series('bds60_heading', icao),
+                                     self._dated_series('track_angles', icao)))
+            title = f"Магнитный курс (BDS 6,0): {display_id}"
+            self._set_lod_data(view['line'], t, values)
+            self._set_lod_data(view['adsb'], trk_t, trk_values)
+            if len(t) == 0:
+                message = f"Нет данных BDS 6,0 для борта {icao}"
+
+        elif mode == 'bds60_ias_mach':
+            (ias_t, ias_values), (mach_t, mach_values) = self._cached(
+                icao, mode, lambda: (self._dated_series('bds60_ias', icao), self._dated_series('bds60_mach', icao)))
+            title = f"Приборная скорость и число Маха (BDS 6,0): {display_id}"
+            self._set_lod_data(view['ias'], ias_t, ias_values)
+            self._set_lod_data(view['mach'], mach_t, mach_values)
+            if len(ias_t) == 0 and len(mach_t) == 0:
+                message = f"Нет данных BDS 6,0 для борта {icao}"
 
         elif mode == 'reg09_tracks':
             title = f"Схема трека по TC 19: {display_id}"
-            if icao not in self.icao_speed_ts or icao not in self.pos_dict:
-                self.ax.text(0.5, 0.5, f"Нет данных TC 19 или координат для борта {icao}", 
-                            ha='center', va='center')
-                self.has_plot_data = False
-
+            if not self.store.has('spd_ts', icao) or not self.store.has('positions', icao):
+                message = f"Нет данных TC 19 или координат для борта {icao}"
             else:
-                tc19_times = self.icao_speed_ts[icao]
-                pos_data = self.pos_dict[icao]
-                
-                pos_times_dict = {}
-                for t, lat, lon in pos_data:
-                    rounded = round(t, 1)
-                    if rounded not in pos_times_dict:
-                        pos_times_dict[rounded] = (lat, lon)
-
-                # координаты для временных меток TC 19
-                tc19_coords = []
-                for tc19_time in sorted(tc19_times):
-                    rounded_time = round(tc19_time, 1)
-                    if rounded_time in pos_times_dict:
-                        lat, lon = pos_times_dict[rounded_time]
-                        tc19_coords.append((lat, lon))
-                
-                if not tc19_coords:
-                    self.ax.text(0.5, 0.5, f"Не найдено координат для сообщений TC 19 борта {icao}", 
-                                ha='center', va='center')
-                    self.has_plot_data = False
+                lats, lons = self._cached(icao, mode, lambda: self._tc19_track_data(icao))
+                if np.isnan(lats).all():
+                    message = f"Не найдено координат для сообщений TC 19 борта {icao}"
                 else:
-                    lons = [lon for lat, lon in tc19_coords]
-                    lats = [lat for lat, lon in tc19_coords]
-                    
-                    self.ax.plot(lons, lats, 'o-', color='lime', linewidth=2, markersize=4, 
-                                label=f"{display_id}")
-                    
-                    self.ax.set_aspect('equal', adjustable='datalim')
-                    self.ax.set_xlabel("Долгота (°)")
-                    self.ax.set_ylabel("Широта (°)")
-                    self.ax.set_title(title)
-                    self.ax.grid(True, linestyle='--', alpha=0.5)
-                    self.ax.legend(fontsize=8, loc='upper left')
-                    
-                    self.has_plot_data = True
+                    view['line'].set_data(lons, lats)
+                    view['line'].set_label(f"{display_id}")
 
         elif mode == 'track_angle':
-            pos_data = self.pos_dict.get(icao, [])
-            gs_data  = self.icao_gs_spd_ts_dict.get(icao, [])
+            pos_t, pos_lats, pos_lons = self.store.get('positions', icao)
+            gs_t, gs_angles = self.store.get('gs_angles', icao)
             title = f"Трек и линия путевого угла: {display_id}"
+            found_any = False
 
-            if not pos_data or not gs_data:
-                self.ax.text(0.5, 0.5, f"Нет данных путевого угла для борта {display_id}", ha='center')
-                self.has_plot_data = False
+            if len(pos_t) == 0 or len(gs_t) == 0:
+                message = f"Нет данных путевого угла для борта {display_id}"
             else:
                 # полный трек
-                full_lons = [lon for t, lat, lon in pos_data]
-                full_lats = [lat for t, lat, lon in pos_data]
-                self.ax.plot(full_lons, full_lats, '-', color='limegreen', linewidth=4, alpha=0.5, label='Полный трек')
-
-                # словарь для поиска координат по времени
-                pos_times = {round(t, 1): (lat, lon) for t, lat, lon in pos_data}
-                track_line_lons = []
-                track_line_lats = []
-
-                # построение линии путевого угла
-                for t, angle in sorted(gs_data):
-                    rounded_t = round(t, 1)
-                    if rounded_t in pos_times:
-                        lat, lon = pos_times[rounded_t]
-                        rad = np.radians(90 - angle)
-                        vector_length = 0.05
-
-                        end_lon = lon + np.cos(rad) * vector_length
-                        end_lat = lat + np.sin(rad) * vector_length
-
-                        track_line_lons.append(end_lon)
-                        track_line_lats.append(end_lat)
-
-                all_lons = full_lons + track_line_lons
-                all_lats = full_lats + track_line_lats
-
-                # линию последнего угла
-                if track_line_lons:
-                    last_angle = gs_data[-1][1]
-                    self.ax.plot(track_line_lons, track_line_lats, '-', color='red', linewidth=1.5,
-                                label=f'Линия путевого угла: {last_angle:.1f}°')
-                else:
-                    self.ax.text(0.5, 0.5, f"Нет данных путевого угла для наложения", ha='center',
-                                 transform=self.ax.transAxes)
+                view['track'].set_data(pos_lons, pos_lats)
 
-                self.ax.set_aspect('equal', adjustable='datalim')
-                self.ax.set_xlim(min(all_lons), max(all_lons))
-                self.ax.set_ylim(min(all_lats), max(all_lats))
-                self.ax.set_title(title)
-                self.ax.grid(True, linestyle='--', alpha=0.3)
-                self.ax.legend(fontsize=8)
-                self.has_plot_data = True
+                # построение линии путевого угла по координатам в моменты сообщений
+                _, _, track_line_lons, track_line_lats = self._cached(
+                    icao, mode, lambda: self._angle_vectors('gs_angles', icao))
+                found = ~np.isnan(track_line_lons)
+                found_any = found.any()
 
-        elif mode == 'airspd_angle':
-            spd_data = self.icao_airspd_ts_dict.get(icao, [])
-            pos_data = self.pos_dict.get(icao, [])
-            title = f"Трек и ориентация самолёта: {display_id}"
+                all_lons = np.concatenate((pos_lons, track_line_lons[found]))
+                all_lats = np.concatenate((pos_lats, track_line_lats[found]))
 
-            if not pos_data or not spd_data:
-                self.ax.text(0.5, 0.5, f"Нет данных TC 19 subtype 3 для {icao}", ha='center')
-                self.has_plot_data = False
-            else:
-                # полный трек
-                full_lons = [lon for t, lat, lon in pos_data]
-                full_lats = [lat for t, lat, lon in pos_data]
-                self.ax.plot(full_lons, full_lats, '-', color='lime', linewidth=4, alpha=0.5, label='Полный трек')
+                # линия последнего угла
+                view['angle'].set_data(track_line_lons, track_line_lats)
+                view['angle'].set_label(f'Линия путевого угла: {gs_angles[-1]:.1f}°')
 
-                track_line_lons = []
-                track_line_lats = []
+                ax.set_xlim(all_lons.min(), all_lons.max())
+                ax.set_ylim(all_lats.min(), all_lats.max())
 
-                for t, angle in sorted(spd_data):
-                    nearest = None
-                    min_diff = None
+            view['angle'].set_visible(found_any)
+            view['note'].set_visible(message is None and not found_any)
 
-                    for pos in pos_data:
-                        diff = abs(pos[0] - t)
-                        if min_diff is None or diff < min_diff:
-                            min_diff = diff
-                            nearest = pos
+        elif mode == 'airspd_angle':
+            spd_t, spd_angles = self.store.get('airspd_angles', icao)
+            pos_t, pos_lats, pos_lons = self.store.get('positions', icao)
+            title = f"Трек и ориентация самолёта: {display_id}"
+            found_any = False
 
-                    if nearest is None:
-                        continue
+            if len(pos_t) == 0 or len(spd_t) == 0:
+                message = f"Нет данных TC 19 subtype 3 для {icao}"
+            else:
+                # полный трек
+                view['track'].set_data(pos_lons, pos_lats)
 
-                    lat, lon = nearest[1], nearest[2]
+                # векторы курса от ближайших по времени точек трека
+                lons, lats, end_lons, end_lats = self._cached(
+                    icao, mode, lambda: self._angle_vectors('airspd_angles', icao, nearest=True))
+                found_any = len(end_lons) > 0
 
-                    rad = np.radians(90 - angle)
-                    vector_length = 0.05
+                all_lons = np.concatenate((pos_lons, end_lons))
+                all_lats = np.concatenate((pos_lats, end_lats))
 
-                    end_lon = lon + np.cos(rad) * vector_length
-                    end_lat = lat + np.sin(rad) * vector_length
+                segments = np.stack((np.column_stack((lons, lats)),
+                                     np.column_stack((end_lons, end_lats))), axis=1)
+                view['vectors'].set_segments(segments)
+                view['vectors'].set_label(f'Магнитный курс: {spd_angles[-1]:.1f}°')
 
-                    track_line_lons.append(end_lon)
-                    track_line_lats.append(end_lat)
+                ax.set_xlim(all_lons.min(), all_lons.max())
+                ax.set_ylim(all_lats.min(), all_lats.max())
 
-                all_lons = full_lons + track_line_lons
-                all_lats = full_lats + track_line_lats
+            view['vectors'].set_visible(found_any)
+            view['note'].set_visible(message is None and not found_any)
 
-                if track_line_lons:
-                    last_angle = spd_data[-1][1]
-                    self.ax.plot(track_line_lons, track_line_lats, '-', color='blue', linewidth=1.5,
-                                label=f'Магнитный курс: {last_angle:.1f}°')
-                else:
-                    self.ax.text(0.5, 0.1, "Нет данных для наложения магнитного курса", ha='center', transform=self.ax.transAxes)
+        # гистограммы промежутков времени
+        elif mode in HIST_MODES:
+            data_source, name, _, _, center, dev, _, title_text = HIST_MODES[mode]
+            callsign = self.store.callsigns.get(icao, "N/A")
+            hist_id = f"{callsign} ({icao})" if callsign != "N/A" else icao
 
-                self.ax.set_aspect('equal', adjustable='datalim')
-                self.ax.set_xlim(min(all_lons), max(all_lons))
-                self.ax.set_ylim(min(all_lats), max(all_lats))
-                self.ax.set_title(title)
-                self.ax.grid(True, linestyle='--', alpha=0.3)
-                self.ax.legend(fontsize=8)
-                self.has_plot_data = True
+            intervals = np.zeros(0)
+            if self.store.has(data_source, icao):
+                intervals = self._cached(icao, mode, lambda: self._intervals(data_source, icao))
 
-        elif mode == 'track':
-            data = self.pos_dict.get(icao, [])
-            title = f"Схема трека полёта: {display_id}"
-            if not data:
-                self.ax.text(0.5, 0.5, f"Нет данных о координатах для борта {icao}", ha='center', va='center')
-                self.has_plot_data = False
+            if len(intervals) == 0:
+                message = f"Нет данных {name} для {icao}"
             else:
-                lons = [lon for t, lat, lon in data]
-                lats = [lat for t, lat, lon in data]
-                self.ax.plot(lons, lats, 'o', markersize=2, label='Трек')
-
-        # гистограммы промежутков времени
-        elif mode in self.hist_modes:
-            callsign = self.icao_callsigns.get(icao, "N/A")
-            display_id = f"{callsign} ({icao})" if callsign != "N/A" else icao
-
-            if mode == 'reg05_hist':
-                data_source = self.icao_airborne_pos_ts
-                name = 'о местоположении в воздухе'
-                color = 'blue'
-                bar_color = 'mediumblue'
-                center, dev, num_bins = 500, 100, 15
-                title_text = (
-                    f'Распределение интервалов сообщений сквиттера '
-                    f'местоположения в воздухе {display_id} (REG05)'
-                )
-
-            elif mode == 'reg06_1_hist':
-                data_source = self.icao_surface_pos_ts
-                name = 'о местоположении на земле при высокой частоте'
-                color = 'red'
-                bar_color = 'firebrick'
-                center, dev, num_bins = 500, 100, 15
-                title_text = (
-                    f'Распределение интервалов сообщений сквиттера '
-                    f'местоположения на земле при высокой частоте {display_id} (REG06)'
-                )
-            
-            elif mode == 'reg06_2_hist':
-                data_source = self.icao_surface_pos_ts
-                name = 'о местоположении на земле при низкой частоте'
-                color = 'red'
-                bar_color = 'firebrick'
-                center, dev, num_bins = 5000, 200, 15
-                title_text = (
-                    f'Распределение интервалов сообщений сквиттера '
-                    f'местоположения на земле при низкой частоте {display_id} (REG06)'
-                )
-
-            elif mode == 'reg08_hist':
-                data_source = self.icao_ident_ts
-                name = 'об опознавательном коде и категории в полете'
-                color = 'cyan'
-                bar_color = 'skyblue'
-                center, dev, num_bins = 5000, 200, 15
-                title_text = (
-                    f'Распределение интервалов сообщений сквиттера '
-                    f'опознавательного кода и категории {display_id} (REG08)'
-                )
-            
-            elif mode == 'reg09_hist':
-                data_source = self.icao_speed_ts
-                name = 'о скорости при нахождении в воздухе'
-                color = 'lime'
-                bar_color = 'mediumseagreen'
-                center, dev, num_bins = 500, 100, 15
-                title_text = (
-                    f'Распределение интервалов сообщений сквиттера '
-                    f'путевой скорости при нахождении в воздухе: {display_id} (REG09)'
-                )
-
-            elif mode == 'reg61_1_hist':
-                data_source = self.icao_status
-                name = 'о статусе воздушного судна для'
-                color = 'darkviolet'
-                bar_color = 'indigo'
-                center, dev, num_bins = 5000, 200, 15
-                title_text = (
-                    f'Распределение интервалов сообщений сквиттера '
-                    f'статуса {display_id} (REG61)'
-                )
-
-            elif mode == 'reg61_2_hist':
-                data_source = self.icao_emg_ts
-                name = 'о сигнале бедствия воздушного судна'
-                color = 'darkviolet'
-                bar_color = 'indigo'
-                center, dev, num_bins = 800, 100, 15
-                title_text = (
-                    f'Распределение интервалов сообщений сквиттера '
-                    f'сигнала бедствия {display_id} (REG61)'
-                )
-
-            elif mode == 'reg61_3_hist':
-                data_source = self.icao_mode_change
-                name = 'о статусe смены Mode A'
-                color = 'darkviolet'
-                bar_color = 'indigo'
-                center, dev, num_bins = 800, 100, 15
-                title_text = (
-                    f'Распределение интервалов сообщений сквиттера '
-                    f'статуса передающей системы {display_id} (REG61)'
-                )
-            
-            elif mode == 'reg61_4_hist':
-                data_source = self.icao_tcas_ra
-                name = 'о статусe передачи TCAS RA'
-                color = 'darkviolet'
-                bar_color = 'indigo'
-                center, dev, num_bins = 800, 100, 15
-                title_text = (
-                    f'Распределение интервалов сообщений сквиттера '
-                    f'статуса TCAS RA {display_id} (REG61)'
-                )
-            
-            elif mode == 'reg62_hist':
-                data_source = self.icao_target_state
-                name = 'о состоянии и статусе цели'
-                color = 'gold'
-                bar_color = 'darkorange'
-                center, dev, num_bins = 1250, 50, 15
-                title_text = (
-                    f'Распределение интервалов сообщений сквиттера '
-                    f'состояния и статуса цели {display_id} (REG62)'
-                )
-
-            elif mode == 'reg65_1_hist':
-                data_source = self.icao_air_op_status
-                name = 'об эксплуатационном статусе в полете'
-                color = 'mediumaquamarine'
-                bar_color = 'lightseagreen'
-                center, dev, num_bins = 2500, 100, 15
-                title_text = (
-                    f'Распределение интервалов сообщений сквиттера '
-                    f'эксплуатационного статуса в полете {display_id} (REG65)'
-                )  
-            
-            elif mode == 'reg65_2_hist':
-                data_source = self.icao_surf_op_status
-                name = 'об эксплуатационном статусе на земле'
-                color = 'mediumaquamarine'
-                bar_color = 'lightseagreen'
-                center, dev, num_bins = 2500, 100, 15
-                title_text = (
-                    f'Распределение интервалов сообщений сквиттера '
-                    f'эксплуатационного статуса на земле {display_id} (REG65)'
-                )
-
-            elif mode == 'df11_hist':
-                data_source = self.icao_df11_ts
-                name = 'об опознавании'
-                color = 'orange'
-                bar_color = 'darkorange'
-                center, dev, num_bins = 1000, 200, 15
-                title_text = (
-                    f'Распределение интервалов сообщений сквиттера '
-                    f'опознавания {display_id} (DF11)'
-                )
-            
-            if icao in data_source and len(data_source[icao]) > 0:
-                timestamps = np.array(sorted(data_source[icao]))
-                intervals = np.diff(timestamps) * 1000
-                intervals = intervals[intervals >= 0]
-                if len(intervals) > 0:
-                    low = center - dev
-                    high = center + dev
-                    
-                    left = intervals[intervals < low]
-                    middle = intervals[(intervals >= low) & (intervals <= high)]
-                    right = intervals[intervals > high]
-                    
-                    bar_width = (high - low) / num_bins
-                    
-                    bin_edges = np.concatenate(([0], np.linspace(low, high, num_bins + 1)))
-                    self.ax.hist(
-                        middle,
-                        bins=bin_edges,
-                        alpha=0.6,
-                        color=color,
-                        edgecolor='black',
-                        label=f"{center-dev}-{center+dev}: {len(middle)}"
-                    )
-
-                    self.ax.bar(
-                        low - bar_width,
-                        len(left),
-                        width=bar_width,
-                        align='edge',
-                        color=bar_color,
-                        edgecolor='black',
-                        label=f"0–{center-dev}: {len(left)}"
-                    )
-
-                    self.ax.bar(
-                        high,
-                        len(right),
-                        width=bar_width,
-                        align='edge',
-                        color=bar_color,
-                        edgecolor='black',
-                        label=f"> {center+dev}: {len(right)}"
-                    )
-
-                    min_interval = intervals.min()
-                    max_interval = intervals.max()
-
-                    self.ax.set_xlim(low - bar_width, high + bar_width)
-                    self.ax.axvline(low, linestyle='--', color='black', alpha=0.8)
-                    self.ax.axvline(high, linestyle='--', color='black', alpha=0.8)
-                    self.ax.set_xlabel('Интервал между сообщениями (мс)')
-                    self.ax.set_ylabel('Количество')
-                    self.ax.set_title(title_text)
-                    self.ax.legend(title=f"Всего интервалов {len(intervals)}")
-
-                    stats_text = f"Min: {round(min_interval, 2)} мс\nMax: {round(max_interval, 2)} мс"
-                    self.ax.text(
-                        0.02, 0.98,
-                        stats_text,
-                        transform=self.ax.transAxes,
-                        ha='left',
-                        va='top',
-                        bbox=dict(facecolor='white', alpha=0.8)
-                    )
-                    self.ax.grid(True, linestyle='--', alpha=0.7)
-                    self.has_plot_data = True
-                    self.fig.canvas.draw_idle()
-                else:
-                    self.ax.text(
-                        0.5, 0.5, 
-                        f"Нет данных {name} для {icao}", 
-                        ha='center', 
-                        va='center', 
-                        fontsize=15
-                    )
-                    self.has_plot_data = False
-            
+                low = center - dev
+                high = center + dev
+                
+                n_left = np.count_nonzero(intervals < low)
+                middle = intervals[(intervals >= low) & (intervals <= high)]
+                n_right = np.count_nonzero(intervals > high)
+
+                # новые высоты столбцов
+                counts, _ = np.histogram(middle, bins=view['bin_edges'])
+                for patch, count in zip(view['middle'], counts):
+                    patch.set_height(count)
+                view['left'][0].set_height(n_left)
+                view['right'][0].set_height(n_right)
+
+                title = title_text.format(hist_id)
+                ax.legend([view['middle'], view['left'], view['right']],
+                          [f"{low}-{high}: {len(middle)}", f"0–{low}: {n_left}", f"> {high}: {n_right}"],
+                          title=f"Всего интервалов {len(intervals)}")
+                view['stats'].set_text(f"Min: {round(intervals.min(), 2)} мс\n"
+                                       f"Max: {round(intervals.max(), 2)} мс")
+
+        # объекты с данными показываются только при наличии данных, иначе - сообщение
+        self.has_plot_data = message is None
+        view['message'].set_text(message or "")
+        for artist in view['artists']:
+            artist.set_visible(self.has_plot_data)
+        for axes in (ax, ax2):
+            if axes is None:
+                continue
+            if self.has_plot_data:
+                axes.set_axis_on()
             else:
-                self.ax.text(0.5, 0.5, f"Нет данных {name} для {icao}", ha='center', va='center', fontsize=15)
-                self.has_plot_data = False
-        
-        if self.has_plot_data == False:
-            self.ax.set_axis_off()
+                axes.set_axis_off()
 
-        # специльная настройка для гистограммы
-        if mode.endswith('_hist'):
-            self.fig.canvas.draw_idle()
-            return
-        
-        # установка общих элементов: заголовок и сетка
-        self.ax.set_title(title)
-        self.ax.grid(True, linestyle='--', alpha=0.7)
-
-        # специальная настройка для графика трека (карты)
-        if mode == 'track' or mode == 'reg09_tracks' or mode == 'track_angle' \
-            or mode == 'gs_spd_angle' or mode == 'airspd_angle':
-            # равномасштабные оси
-            self.ax.set_aspect('equal', adjustable='datalim')
-            self.ax.set_xlabel("Долгота (°)")
-            self.ax.set_ylabel("Широта (°)")
-        # общие настройки для временных графиков
+        # установка общих элементов: заголовок и легенда
+        ax.set_title(title)
+        if mode in HIST_MODES:
+            if not self.has_plot_data and ax.get_legend():
+                ax.get_legend().remove()
         else:
-            self.ax.set_xlabel("Время (UTC)")
-            # форматируем подписи на оси x для отображения времени
-            self.ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S.%f'))
-            # автоматически поворачиваем подписи, чтобы они не накладывались друг на друга
-            self.fig.autofmt_xdate(rotation=30)
-            if mode != 'altitude_speed_combined':
-                self.ax.set_ylabel(label)
-        
-        # отображение легенды, если она есть
-        if self.ax.get_legend_handles_labels()[0] and mode != 'altitude_speed_combined':
-            self.ax.legend()
-
-        # применение сохранённого масштаба (кроме комбинированного графика)
-        if mode != 'altitude_speed_combined':
+            handles = [artist for artist in view['legend'] if has_legend_data(artist)]
+            if handles and self.has_plot_data:
+                # общая легенда для обеих осей комбинированного графика
+                ax.legend(handles=handles, loc='upper left' if ax2 else 'best')
+            elif ax.get_legend():
+                ax.get_legend().remove()
+
+        # пределы осей по новым данным
+        if mode in HIST_MODES:
+            ax.relim()
+            ax.autoscale(axis='y')
+        elif mode not in ('track_angle', 'airspd_angle'):
+            for axes in (ax, ax2):
+                if axes is not None:
+                    axes.relim()
+                    axes.autoscale()
+
+        # применение сохранённого масштаба временных графиков
+        if mode == 'altitude_speed_combined':
+            ax.set_ylim(0, 40000)
+            ax2.set_ylim(0, 500)
+        elif mode in self.ylims and mode not in MAP_MODES:
             ylim = self.ylims[mode].get(icao, self.default_ylims.get(mode))
             if ylim and ylim != 'auto':
-                self.ax.set_ylim(ylim)
-
-        # перерисовка окна с обновлённым графиком
-        self.fig.canvas.draw_idle()
+                ax.set_ylim(ylim)
 
     # масштабирование колесом мыши
     def on_scroll(self, event):
@@ -808,8 +939,7 @@ class IcaoPlots:
             return
 
         # специальная логика для 2d-масштабирования карты
-        if mode == 'track' or mode == 'reg09_tracks' or mode == 'track_angle' \
-            or mode == 'gs_spd_angle' or mode == 'airspd_angle':
+        if mode in MAP_MODES:
             cur_xlim = self.ax.get_xlim()
             cur_ylim = self.ax.get_ylim()
             xdata = event.xdata
@@ -838,8 +968,12 @@ class IcaoPlots:
             # устанавливаем новые пределы для оси y
             self.ax.set_ylim([ydata - new_height * (1-rel_y), ydata + new_height * rel_y])
 
+            # запоминаем масштаб, чтобы он сохранялся при перерисовке
+            if mode in self.ylims and self.icao_list:
+                self.ylims[mode][self.icao_list[self.icao_index]] = self.ax.get_ylim()
+
         # обновляем график
-        self.fig.canvas.draw_idle()
+        self._redraw()
 
     # навигация между бортами и графиками
     def show_graphs(self, event=None):
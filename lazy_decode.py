@@ -0,0 +1,86 @@
+import threading
+from aircraft_store import AircraftStore
+from parsing import parse_log_block
+from processing import process_batch
+
+# число соседних по списку бортов с каждой стороны, декодируемых заранее
+PREFETCH_NEIGHBOURS = 1
+
+# отложенное декодирование по бортам: по индексу смещений строк (OffsetIndex) известны
+# строки каждого борта, время первого и последнего сообщения и позывной;
+# полное декодирование борта выполняется в фоновом потоке, когда борт показывается
+class LazyDecoder(threading.Thread):
+    def __init__(self, store, file_path, index, target_icaos=None):
+        super().__init__(daemon=True)
+        self.store = store
+        self.file_path = file_path
+        self.index = index
+        self.target_icaos = target_icaos
+
+        # блокировка данных хранилища на время добавления борта и отрисовки
+        self.lock = threading.RLock()
+        # номер версии данных, увеличивается после декодирования каждого борта
+        self.version = 0
+        # очередь бортов на декодирование (первый - показываемый)
+        self.queue = []
+        self.wakeup = threading.Condition()
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+        with self.wakeup:
+            self.wakeup.notify()
+
+    # список бортов с ads-b сообщениями, время первого и последнего сообщения, позывные
+    # и число отброшенных по crc сообщений из индекса; все борты отмечаются как ещё
+    # не декодированные
+    def load_index(self):
+        store = self.store
+        for aa, times in self.index.times.items():
+            if self.target_icaos and aa not in self.target_icaos:
+                continue
+            store.icao_list.add(aa)
+            store.times[aa] = list(times)
+            if aa in self.index.callsigns:
+                store.callsigns[aa] = self.index.callsigns[aa]
+        store.undecoded = set(store.icao_list)
+        store.crc_rejected += self.index.rejected_count()
+
+    # декодирование бортов по порядку: первый - показываемый, остальные - заранее;
+    # прежняя очередь заменяется
+    def request(self, icaos):
+        with self.wakeup:
+            self.queue = [aa for aa in dict.fromkeys(icaos) if aa in self.store.undecoded]
+            self.wakeup.notify()
+
+    # текущий борт и соседние по списку
+    def request_around(self, icao_list, index):
+        n = len(icao_list)
+        order = [0]
+        for k in range(1, PREFETCH_NEIGHBOURS + 1):
+            order += [k, -k]
+        self.request([icao_list[(index + k) % n] for k in order])
+
+    def run(self):
+        while not self.stopped.is_set():
+            with self.wakeup:
+                while not self.queue and not self.stopped.is_set():
+                    self.wakeup.wait()
+                if self.stopped.is_set():
+                    return
+                icao = self.queue.pop(0)
+            if icao in self.store.undecoded:
+                self.decode(icao)
+
+    # полное декодирование одного борта: его строки читаются по смещениям и обрабатываются
+    # в отдельном хранилище без блокировки, затем данные переносятся в общее хранилище
+    def decode(self, icao):
+        timestamps, messages = parse_log_block(self.index.read_lines(self.file_path, [icao]))
+
+        part = AircraftStore()
+        process_batch(part, timestamps, messages, {icao})
+
+        with self.lock:
+            self.store.merge(part)
+            self.store.undecoded.discard(icao)
+            self.version += 1
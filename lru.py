@@ -0,0 +1,46 @@
+from collections import OrderedDict
+
+# ограниченный по размеру кэш с вытеснением давно не использованных записей
+# и статистикой попаданий
+class LRUCache:
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    # изменение размера кэша с вытеснением лишних записей
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        while len(self.data) > max(maxsize, 0):
+            self.data.popitem(last=False)
+
+    def clear(self):
+        self.data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    # доля попаданий среди всех обращений
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self.data)
@@ -1,279 +1,234 @@
 import pyModeS as pms
+import numpy as np
 import argparse
-from dict_data import *
+from aircraft_store import AircraftStore
 from parsing import *
 from time_formatter import *
 from icao_plots import *
+from processing import *
+from parallel_ingest import process_file_parallel
+from sidecar import source_key, quick_source_key, sidecar_path, load_sidecar, save_sidecar
+from follow import LogFollower
+from export_plots import export_plots, EXPORT_FORMATS
+from lazy_decode import LazyDecoder
+from offset_index import open_index, load_index, index_key
+from time_window import window_range, read_range, select_window
+import os
 import sys
 
 MAX_MESSAGE_LENGTH = 32
 DEFAULT_FILE = "data/2025-12-29.1766986424.606828104.t4433"
 
-pms_df = pms.df
-pms_icao = pms.icao
-pms_tc = pms.adsb.typecode
-pms_oe_flag = pms.adsb.oe_flag
-pms_pos = pms.adsb.position
-hex2bin = pms.common.hex2bin
-bin2int = pms.common.bin2int
-pms_velocity = pms.adsb.velocity
-emergency_squawk = pms.adsb.emergency_squawk
+# итоговая сводная таблица
+def print_summary(store):
+    print("=" * 160)
+    print(" " * 60 + "Сводная таблица")
+    print("=" * 160)
+    print(f"{'ICAO':<8} {'Номер рейса':<12} {'Первое (UTC)':<33} {'Последнее (UTC)':<33} "
+          f"{'Координаты':<12} {'Курс':<8} {'Выб. высота':<12} {'Разн. высот':<12} "
+          f"{'Барокорр.':<10} {'GNSS':<6}")
+    print("-" * 160)
+
+    icaos = [icao for icao in sorted(list(store.icao_list)) if icao in store.times]
+    # время первого и последнего сообщения всех бортов форматируется одним вызовом
+    times = np.array([store.times[icao] for icao in icaos], dtype=np.int64).reshape(-1, 2)
+    first_strs = format_timestamps_with_nanoseconds(times[:, 0]).tolist()
+    last_strs = format_timestamps_with_nanoseconds(times[:, 1]).tolist()
+
+    for icao, first_utc_str, last_utc_str in zip(icaos, first_strs, last_strs):
+
+        callsign = store.callsigns.get(icao, "N/A")
+
+        sel_alt_flag = "Да" if icao in store.has_selected_alt else "Нет"
+        coord_flag = "Да" if store.has('positions', icao) else "Нет"
+        course_flag = "Да" if store.has('courses', icao) else "Нет"
+        alt_diff_flag = "Да" if store.has('altitude_difference', icao) else "Нет"
+        baro_corr_flag = "Да" if store.has('baro_correction', icao) else "Нет"
+        gnss_flag = "Да" if icao in store.has_gnss else "Нет"
+        # борт ещё не декодирован полностью (--lazy): наличие данных неизвестно
+        if icao in store.undecoded:
+            sel_alt_flag = coord_flag = course_flag = alt_diff_flag = baro_corr_flag = gnss_flag = "?"
+        print(f"{icao:<8} {callsign:<12} {first_utc_str:<33} "
+              f"{last_utc_str:<33} "
+              f"{coord_flag:<12} {course_flag:<8} {sel_alt_flag:<12} {alt_diff_flag:<12} "
+              f"{baro_corr_flag:<10} {gnss_flag:<6}")
+
+    print(f"\nВсего бортов: {len(store.icao_list)}")
+    if store.crc_corrected or store.crc_rejected:
+        print(f"Ошибки CRC ADS-B: исправлено {store.crc_corrected}, отброшено {store.crc_rejected}")
+    if store.undecoded:
+        print(f"Не декодировано полностью (? - декодируется при просмотре): {len(store.undecoded)}")
+    if decode_cache.maxsize > 0 and decode_cache.misses > 0:
+        print(f"Кэш декодирования: {decode_cache.hits} попаданий из "
+              f"{decode_cache.hits + decode_cache.misses} ({decode_cache.hit_ratio():.1%}), "
+              f"записей {len(decode_cache)}")
+    print()
 
 if __name__ == '__main__':
     # парсинг аргументов из командной строки
     parser = argparse.ArgumentParser()
     parser.add_argument("-f", "--file", help="Имя входного файла", default=DEFAULT_FILE)
-    parser.add_argument("-a", "--aircraft", help="ICAO адрес конкретного борта")
+    parser.add_argument("-a", "--aircraft",
+                        help="ICAO адреса бортов через запятую или файл со списком адресов")
+    parser.add_argument("-b", "--batch", action="store_true",
+                        help="Пакетный режим: векторное декодирование заголовков всего файла")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Число процессов для параллельного декодирования файла")
+    parser.add_argument("--follow", action="store_true",
+                        help="Следить за дописываемым файлом и обновлять таблицу и графики")
+    parser.add_argument("--no-sidecar", action="store_true",
+                        help="Не использовать файл-спутник с декодированными данными (.npz рядом с логом)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="Размер кэша декодированных сообщений (0 - без кэша)")
+    parser.add_argument("--export", metavar="DIR",
+                        help="Сохранить все графики и гистограммы бортов в каталог без открытия окна")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="png",
+                        help="Формат файлов для --export")
+    parser.add_argument("--dpi", type=int, default=100,
+                        help="Разрешение файлов для --export (точек на дюйм)")
+    parser.add_argument("--lazy", action="store_true",
+                        help="Отложенное декодирование: сначала только индекс строк по бортам, "
+                             "борт декодируется полностью при просмотре")
+    parser.add_argument("--start",
+                        help="Начало интервала времени: UTC \"ГГГГ-ММ-ДД ЧЧ:ММ:СС[.доли]\" или unix время")
+    parser.add_argument("--end",
+                        help="Конец интервала времени (включительно), в том же виде, что --start")
     args = parser.parse_args()
+    if args.batch and args.jobs > 1:
+        parser.error("-b нельзя использовать вместе с -j: части файла и так декодируются пакетно")
+    if args.export and args.follow:
+        parser.error("--export нельзя использовать вместе с --follow")
+    if args.lazy and (args.follow or args.export):
+        parser.error("--lazy нельзя использовать вместе с --follow и --export")
+    window = args.start is not None or args.end is not None
+    if window and (args.follow or args.lazy):
+        parser.error("--start/--end нельзя использовать вместе с --follow и --lazy")
 
     file_path = args.file
-    target_icao = args.aircraft.upper() if args.aircraft else None
+    target_icaos = None
+    if args.aircraft:
+        try:
+            target_icaos = parse_icao_set(args.aircraft)
+        except (ValueError, OSError) as e:
+            parser.error(str(e))
+    start_ns = end_ns = None
+    try:
+        if args.start is not None:
+            start_ns = parse_time_arg(args.start)
+        if args.end is not None:
+            end_ns = parse_time_arg(args.end)
+    except ValueError as e:
+        parser.error(str(e))
+    if start_ns is not None and end_ns is not None and start_ns > end_ns:
+        parser.error("--start позже --end")
+    decode_cache.resize(args.cache_size)
     
     try:
-        # основной цикл чтения файла
-        with open(file_path, "r") as f:
-            for line_num, line in enumerate(f, 1):
-                # пропуск пустых строк
-                if not line.strip(): 
-                    continue 
-
-                parsed = parse_ads_b_line(line)
-
-                if parsed is None: 
-                    continue
-
-                timestamp, message_spaced, message_str = parsed
-
-                try:
-                    df = pms_df(message_str)
-                except Exception:
-                    continue 
-
-                if df == 11:
-                    try:
-                        aa = pms_icao(message_str)
-                    except Exception:
-                        continue
-                    icao_acq_ts.setdefault(aa, []).append(timestamp)
-                    continue
-
-                # только ads-b сообщения
-                if df not in (17, 18): 
-                    continue 
-
-                try:
-                    aa = pms_icao(message_str)
-                except Exception:
-                    continue
-
-                # фильтрация по заданному борту
-                if target_icao and aa != target_icao: 
-                    continue
-
-                adsb_icao_list.add(aa)
-
-                # время первого/последнего сообщения для борта
-                if aa not in icao_times:
-                    icao_times[aa] = {"first": timestamp, "last": timestamp}
+        # хранилище данных по бортам
+        store = AircraftStore()
+
+        follower = None
+        decoder = None
+        # --lazy без -a: если рядом с логом есть актуальный файл-спутник, данные всех
+        # бортов загружаются из него без индексного прохода и декодирования. весь лог
+        # при этом не читается: файл-спутник проверяется, как индекс, по размеру,
+        # времени изменения и хэшу начала и конца лога
+        lazy_sidecar = (args.lazy and not target_icaos and not args.no_sidecar
+                        and os.path.exists(file_path)
+                        and load_sidecar(store, file_path, quick_source_key(file_path)))
+        if args.follow:
+            # режим слежения: файл читается в фоновом потоке, включая дописываемые строки
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(file_path)
+            follower = LogFollower(store, file_path, target_icaos,
+                                    on_summary=lambda: print_summary(store))
+            follower.start()
+            # ждём, пока будет прочитано уже записанное содержимое
+            follower.caught_up.wait()
+        elif lazy_sidecar:
+            print(f"Данные загружены из файла {sidecar_path(file_path)}")
+        elif target_icaos or args.lazy or window:
+            if target_icaos or args.lazy:
+                # индекс смещений строк по бортам (файл <лог>.idx.npz, строится при первом запуске)
+                index = open_index(file_path, use_file=not args.no_sidecar)
+            elif not os.path.exists(file_path):
+                raise FileNotFoundError(file_path)
+            else:
+                # для одного интервала времени индекс не строится (это полный проход по файлу),
+                # а только используется, если уже есть
+                index = None if args.no_sidecar else load_index(file_path, index_key(file_path))
+
+            if args.lazy:
+                # полное декодирование бортов - в фоновом потоке при просмотре
+                decoder = LazyDecoder(store, file_path, index, target_icaos)
+                decoder.load_index()
+                decoder.start()
+            else:
+                # границы интервала времени ищутся двоичным поиском по смещениям в файле,
+                # читается только часть файла внутри интервала
+                lo, hi = window_range(file_path, start_ns, end_ns, index)
+                if target_icaos:
+                    # строки заданных бортов читаются по смещениям без чтения всего файла
+                    data = index.read_lines(file_path, target_icaos, lo, hi)
                 else:
-                    icao_times[aa]["last"] = timestamp
-                
-                try:
-                    tc = pms_tc(message_str)
-                except Exception:
-                    continue
-                    
-                if 5 <= tc <= 8:
-                    icao_surface_pos_ts[aa].append(timestamp)
-
-                # сообщения с высотой и координатами (tc 9-18)
-                elif 9 <= tc <= 18:
-                    icao_airborne_pos_ts[aa].append(timestamp)
-
-                    alt = get_altitude(message_str)
-                    if alt is not None and -1000 <= alt <= 50000:
-                        icao_altitude[aa].append((timestamp, alt, 'baro'))
-                    
-                    # логика декодирования координат из двух cpr сообщений
-                    cpr_messages.setdefault(aa, [None, None])
-                    oe_flag = pms_oe_flag(message_str)
-                    cpr_messages[aa][oe_flag] = (message_str, timestamp)
-                    # если получены оба сообщения (чётное и нечётное) в пределах 10 секунд
-                    if all(cpr_messages[aa]):
-                        msg0, t0 = cpr_messages[aa][0]
-                        msg1, t1 = cpr_messages[aa][1]
-                        if abs(t0 - t1) < 10:
-                            pos = pms_pos(msg0, msg1, t0, t1)
-                            if pos:
-                                icao_positions[aa].append((timestamp, pos[0], pos[1]))
-                            # сбрасываем сообщения для следующей пары
-                            cpr_messages[aa] = [None, None]
-
-                # сообщения с позывным (tc 1-4)
-                elif 1 <= tc <= 4:
-                    icao_ident_ts[aa].append(timestamp)
-                    cs = get_callsign(message_str)
-                    if cs: 
-                        icao_callsigns[aa] = cs
-
-                elif tc == 19:
-                    icao_spd_ts[aa].append(timestamp)
-
-                    msg_bin = hex2bin(message_str)
-                    subtype = bin2int(msg_bin[37:40])
-
-                    try:
-                        spd, angle, ns_vel, ew_vel = pms_velocity(message_str)
-                    except Exception:
-                        continue
-
-                    if subtype == 1:
-                        icao_gs_spd_ts[aa].append((timestamp, angle))
-                    elif subtype == 3:
-                        icao_airspd_ts[aa].append((timestamp, angle))
-
-                    gs = get_velocity(message_str)
-                    if gs is not None and 0 <= gs <= 1000:
-                        icao_speed[aa].append((timestamp, gs))
-
-                    track_angle = get_track_angle(message_str)
-                    if track_angle is not None:
-                        icao_track_angles[aa].append((timestamp, track_angle))
-                    
-                    course = get_course(message_str)
-                    if course is not None:
-                        icao_courses[aa].append((timestamp, course))
-                    
-                    # разница высот
-                    alt_diff = get_altitude_difference(message_str)
-                    if alt_diff is not None:
-                        icao_altitude_difference[aa].append((timestamp, alt_diff))
-                        icao_has_gnss[aa] = True
-
-                # сообщения с GNSS высотой
-                elif 20 <= tc <= 22:
-                    icao_airborne_pos_ts[aa].append(timestamp)
-
-                    alt = get_altitude(message_str)
-                    if alt is not None and -1000 <= alt <= 50000:
-                        icao_altitude[aa].append((timestamp, alt, 'gnss'))
-                        icao_has_gnss[aa] = True
-                            
-                elif tc == 28:
-                    # TCAS RA (subtype 2)
-                    try:
-                        if pms.adsb.tcas_ra(message_str):
-                            icao_tcas_ts[aa].append(timestamp)
-                            continue
-                    except Exception:
-                        pass
-                    
-                    # остальные подтипы (0 и 1)
+                    data = read_range(file_path, lo, hi)
+                # строки бортов выбраны по индексу: с адресами после исправления crc
+                # и ответами наблюдения, в тексте которых адреса нет
+                timestamps, messages = select_window(*parse_log_block(data), start_ns, end_ns)
+                process_batch(store, timestamps, messages, target_icaos)
+                if target_icaos:
+                    # отброшенные по crc строки не относятся ни к одному борту и в выборку
+                    # по индексу не попадают - их число берётся из индекса
+                    store.crc_rejected += index.rejected_count(lo, hi, start_ns, end_ns)
+                if window and not store.icao_list:
+                    print("Нет сообщений в заданном интервале времени")
+                    sys.exit(0)
+        else:
+            # ключ исходного файла для проверки актуальности файла-спутника
+            key = None if args.no_sidecar else source_key(file_path)
+
+            if key and load_sidecar(store, file_path, key):
+                print(f"Данные загружены из файла {sidecar_path(file_path)}")
+            else:
+                if args.jobs > 1:
+                    # параллельное декодирование частей файла в пуле процессов
+                    process_file_parallel(store, file_path, args.jobs)
+                elif args.batch:
+                    # пакетный режим: весь файл загружается в память и обрабатывается целиком
+                    timestamps, messages = load_log(file_path)
+                    process_batch(store, timestamps, messages)
+                else:
+                    # основной цикл чтения файла (в двоичном режиме, блоками)
+                    for timestamp, message_str in read_log(file_path):
+                        process_record(store, timestamp, message_str)
+                # регистры comm-b определяются по всем ответам бортов после чтения файла
+                update_commb(store)
+
+                # сохраняем декодированные данные всего файла для повторного открытия
+                if key:
                     try:
-                        squawk = emergency_squawk(message_str)
-                    except RuntimeError as e:
-                        # пропуск ошибки ACAS-RA
-                        if "ACAS-RA" in str(e):
-                            squawk = None
-                        else:
-                            squawk = None
-                    except Exception:
-                        squawk = None
-
-                    if squawk is not None:
-                        # subtype 0 или 1
-                        try:
-                            is_emg = pms.adsb.is_emergency(message_str)
-                        except RuntimeError as e:
-                            if "ACAS-RA" in str(e):
-                                is_emg = False
-                            else:
-                                is_emg = False
-                        except Exception:
-                            is_emg = False
-                        if is_emg:
-                            icao_emg_ts[aa].append(timestamp)
-                        else:
-                            icao_status_ts[aa].append(timestamp)
-
-                        prev = last_mode_a.get(aa)
-                        if prev is not None and squawk != prev:
-                            if squawk not in ("1000", "7500", "7600", "7700"):
-                                change_event_start[aa] = timestamp
-
-                        if aa in change_event_start and (timestamp - change_event_start[aa] <= 24.5):
-                            icao_mode_a_ts[aa].append(timestamp)
-
-                        last_mode_a[aa] = squawk
-
-                elif tc == 29:
-                    icao_target_state_ts[aa].append(timestamp)
-                    sel_alt = get_selected_altitude(message_str)
-                    if sel_alt:
-                        sel_alt_value, modes = sel_alt
-                        icao_selected_altitude[aa].append((timestamp, sel_alt_value))
-                        icao_has_selected_alt[aa] = True
-                        modes_key = f"{aa}_modes"
-                        existing_modes = icao_callsigns.get(modes_key, set())
-                        icao_callsigns[modes_key] = existing_modes.union(modes)
-                    
-                    # барокоррекция
-                    baro_corr = get_baro_correction(message_str)
-                    if baro_corr is not None:
-                        icao_baro_correction[aa].append((timestamp, baro_corr))
-
-                elif tc == 31:
-                    msg_bin = hex2bin(message_str)
-                    subtype = bin2int(msg_bin[37:40])
-
-                    if subtype == 0:
-                        icao_air_op_status_ts[aa].append(timestamp)
-                    elif subtype == 1:
-                        icao_surf_op_status_ts[aa].append(timestamp)
-
-        if target_icao:
-            if target_icao not in adsb_icao_list:
-                print(f"\nБорт {target_icao} не найден")
+                        save_sidecar(store, file_path, key)
+                    except OSError as e:
+                        print(f"Не удалось сохранить файл {sidecar_path(file_path)}: {e}")
+
+        if target_icaos and not follower:
+            for icao in sorted(target_icaos - store.icao_list):
+                print(f"\nБорт {icao} не найден")
+            if not store.icao_list:
                 sys.exit(0)
-        # итоговая сводная таблица
-        print("=" * 160)
-        print(" " * 60 + "Сводная таблица")
-        print("=" * 160)
-        print(f"{'ICAO':<8} {'Номер рейса':<12} {'Первое (UTC)':<33} {'Последнее (UTC)':<33} "
-              f"{'Координаты':<12} {'Курс':<8} {'Выб. высота':<12} {'Разн. высот':<12} "
-              f"{'Барокорр.':<10} {'GNSS':<6}")
-        print("-" * 160)
-
-        for icao in sorted(list(adsb_icao_list)):
-            if icao not in icao_times: 
-                continue
-            times = icao_times[icao]
-            
-            first_utc_str = format_timestamp_with_nanoseconds(times["first"])
-            last_utc_str = format_timestamp_with_nanoseconds(times["last"])
-            
-            callsign = icao_callsigns.get(icao, "N/A")
-            
-            sel_alt_flag = "Да" if icao_has_selected_alt.get(icao) else "Нет"
-            coord_flag = "Да" if icao in icao_positions and icao_positions[icao] else "Нет"
-            course_flag = "Да" if icao in icao_courses and icao_courses[icao] else "Нет"
-            alt_diff_flag = "Да" if icao in icao_altitude_difference and icao_altitude_difference[icao] else "Нет"
-            baro_corr_flag = "Да" if icao in icao_baro_correction and icao_baro_correction[icao] else "Нет"
-            gnss_flag = "Да" if icao_has_gnss.get(icao) else "Нет"
-            print(f"{icao:<8} {callsign:<12} {first_utc_str:<33} "
-                  f"{last_utc_str:<33} "
-                  f"{coord_flag:<12} {course_flag:<8} {sel_alt_flag:<12} {alt_diff_flag:<12} "
-                  f"{baro_corr_flag:<10} {gnss_flag:<6}")
-
-        print(f"\nВсего бортов: {len(adsb_icao_list)}\n")
-        
-        # запуск графиков с передачей всех собранных данных
-        IcaoPlots(icao_altitude, icao_speed, icao_positions, icao_courses, adsb_icao_list, 
-                   icao_callsigns, icao_selected_altitude, icao_altitude_difference, 
-                   icao_baro_correction, icao_airborne_pos_ts, icao_surface_pos_ts, icao_ident_ts,
-                   icao_spd_ts, icao_status_ts, icao_emg_ts, icao_mode_a_ts, icao_tcas_ts,
-                   icao_target_state_ts, icao_air_op_status_ts, icao_surf_op_status_ts, icao_acq_ts, 
-                   icao_track_angles, icao_gs_spd_ts, icao_airspd_ts)
+        if follower:
+            with follower.lock:
+                print_summary(store)
+        else:
+            print_summary(store)
+
+        if args.export:
+            # сохранение графиков в файлы (в процессах -j)
+            count = export_plots(store, args.export, args.format, args.dpi, args.jobs)
+            print(f"Сохранено файлов: {count} в каталог {args.export}")
+        else:
+            # запуск графиков по данным хранилища
+            IcaoPlots(store, follower=follower, decoder=decoder)
         
     except FileNotFoundError:
         print(f"Файл {file_path} не найден")
@@ -0,0 +1,276 @@
+import os
+import hashlib
+import numpy as np
+from parsing import parse_log_block, decode_message, READ_BLOCK
+from bulk_decode import decode_headers, icao_to_str
+from bulk_crc import correct_messages, message_lengths, recover_addresses
+from time_formatter import NS_PER_SEC
+
+# версия формата файла индекса, увеличивается при изменении его содержимого
+INDEX_VERSION = 4
+
+# размер начала и конца файла, по которым проверяется актуальность индекса (байт)
+KEY_BLOCK = 1 << 20
+
+# путь к файлу индекса рядом с логом
+def index_path(file_path):
+    return file_path + ".idx.npz"
+
+# ключ исходного файла для индекса: размер, время изменения и хэш начала и конца файла
+# (без чтения всего файла, иначе индекс не ускорял бы выборку из большого лога)
+def index_key(file_path):
+    st = os.stat(file_path)
+    h = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        h.update(f.read(KEY_BLOCK))
+        if st.st_size > KEY_BLOCK:
+            f.seek(max(st.st_size - KEY_BLOCK, KEY_BLOCK))
+            h.update(f.read())
+    return {'size': st.st_size, 'mtime': st.st_mtime_ns, 'hash': h.hexdigest()}
+
+# индекс смещений строк лога: для каждого борта (адрес df 11/17/18 или восстановленный
+# адрес ответа наблюдения df 4/5/20/21 борта с ads-b сообщениями) - начала и длины
+# его строк в порядке файла, для каждой секунды - смещение первой строки с этого времени
+class OffsetIndex:
+    def __init__(self):
+        # icao -> начала строк (int64) и длины строк без перевода строки (uint16)
+        self.offsets = {}
+        self.lengths = {}
+        # время первого и последнего ads-b сообщения: icao -> [first, last]
+        self.times = {}
+        self.callsigns = {}
+        # секунды, с которых начинаются строки, и смещения первых таких строк
+        # (время берётся как наибольшее до этой строки, поэтому ряды возрастают)
+        self.bucket_seconds = np.empty(0, dtype=np.int64)
+        self.bucket_offsets = np.empty(0, dtype=np.int64)
+        # ads-b сообщения, отброшенные по crc (борт не известен, в строки бортов
+        # не попадают): начала строк и время
+        self.rejected_offsets = np.empty(0, dtype=np.int64)
+        self.rejected_times = np.empty(0, dtype=np.int64)
+
+    # байтовые диапазоны [начало, конец) строк бортов в порядке файла, начинающихся
+    # в части файла [lo, hi); подряд идущие строки объединяются в один диапазон
+    def ranges(self, icaos, lo=0, hi=None):
+        starts, lengths = [], []
+        for aa in icaos:
+            if aa not in self.offsets:
+                continue
+            offsets = self.offsets[aa]
+            # смещения строк борта возрастают, часть файла выбирается двоичным поиском
+            k = np.searchsorted(offsets, [lo, hi if hi is not None else np.iinfo(np.int64).max])
+            starts.append(offsets[k[0]:k[1]])
+            lengths.append(self.lengths[aa][k[0]:k[1]])
+        starts = np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)
+        if len(starts) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+        # конец строки вместе с переводом строки
+        ends = starts + np.concatenate(lengths) + 1
+        order = np.argsort(starts, kind='stable')
+        starts, ends = starts[order], ends[order]
+        new = np.flatnonzero(np.r_[True, starts[1:] != ends[:-1]])
+        return np.column_stack((starts[new], ends[np.r_[new[1:] - 1, len(ends) - 1]]))
+
+    # строки бортов, прочитанные по диапазонам (seek + read)
+    def read_lines(self, file_path, icaos, lo=0, hi=None):
+        parts = []
+        with open(file_path, "rb") as f:
+            for start, end in self.ranges(icaos, lo, hi).tolist():
+                f.seek(start)
+                part = f.read(end - start)
+                parts.append(part if part.endswith(b"\n") else part + b"\n")
+        return b"".join(parts)
+
+    # смещение первой строки секунды, в которую попадает время t (нс): строки со временем
+    # не меньше t начинаются не раньше него. None, если таких строк нет
+    def bucket_offset(self, t):
+        k = np.searchsorted(self.bucket_seconds, t // NS_PER_SEC)
+        if k == len(self.bucket_offsets):
+            return None
+        return int(self.bucket_offsets[k])
+
+    # число отброшенных по crc ads-b сообщений в части файла [lo, hi) со временем
+    # от start до end включительно (None - без границы), как при выборке интервала времени
+    def rejected_count(self, lo=0, hi=None, start=None, end=None):
+        k = np.searchsorted(self.rejected_offsets, [lo, hi if hi is not None else np.iinfo(np.int64).max])
+        t = self.rejected_times[k[0]:k[1]]
+        keep = np.ones(len(t), dtype=bool)
+        if start is not None:
+            keep &= t >= start
+        if end is not None:
+            keep &= t <= end
+        return int(np.count_nonzero(keep))
+
+# построение индекса за один проход по файлу: заголовки (df, icao, tc) декодируются
+# векторно, pyModeS вызывается только для сообщений с позывным
+def build_index(file_path, block_size=READ_BLOCK):
+    index = OffsetIndex()
+    offsets, lengths = {}, {}
+    buckets, rejected = [], []
+    last_second = None
+    base = 0
+    tail = b""
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            data = tail + block
+            # последняя неполная строка переносится в следующий блок
+            end = data.rfind(b"\n") + 1
+            tail = data[end:]
+            last_second = _index_block(index, data[:end], base, offsets, lengths, buckets, rejected,
+                                       last_second)
+            base += end
+    if tail:
+        _index_block(index, tail, base, offsets, lengths, buckets, rejected, last_second)
+
+    for aa in offsets:
+        index.offsets[aa] = np.concatenate(offsets[aa])
+        index.lengths[aa] = np.concatenate(lengths[aa])
+    if buckets:
+        index.bucket_seconds, index.bucket_offsets = np.concatenate(buckets, axis=1)
+    if rejected:
+        index.rejected_offsets, index.rejected_times = np.concatenate(rejected, axis=1)
+    return index
+
+def _index_block(index, data, base, offsets, lengths, buckets, rejected, last_second):
+    timestamps, messages, starts = parse_log_block(data, with_offsets=True)
+    if not messages:
+        return last_second
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    # конец строки - ближайший перевод строки после её начала
+    newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n"))
+    k = np.searchsorted(newlines, starts)
+    ends = np.append(newlines, len(data))[k]
+
+    # секунды, на которых наибольшее время строк увеличивается
+    seconds = np.maximum.accumulate(timestamps // NS_PER_SEC)
+    if last_second is not None:
+        seconds = np.maximum(seconds, last_second)
+    prev = np.r_[last_second if last_second is not None else seconds[0] - 1, seconds[:-1]]
+    rise = np.flatnonzero(seconds > prev)
+    buckets.append(np.vstack((seconds[rise], starts[rise] + base)))
+
+    # адреса ads-b сообщений - после проверки crc (с исправлением ошибки в одном бите),
+    # отброшенные по crc строки в индекс не попадают
+    matrix, _, crc_rejected = correct_messages(messages)
+    headers = decode_headers(matrix)
+    df = headers['df']
+    is_adsb = ((df == 17) | (df == 18)) & ~crc_rejected
+    bad = np.flatnonzero(crc_rejected)
+    if len(bad):
+        rejected.append(np.vstack((starts[bad] + base, timestamps[bad])))
+
+    # ответы наблюдения - только от бортов с ads-b сообщениями до конца этого блока
+    # (точная проверка по порядку сообщений - при декодировании)
+    address = recover_addresses(matrix, df, message_lengths(messages))
+    known = np.concatenate((np.array([int(a, 16) for a in index.times], dtype=np.int64),
+                            headers['icao'][is_adsb]))
+    surveillance = (address >= 0) & np.isin(address, known)
+
+    selected = np.flatnonzero((df == 11) | is_adsb | surveillance)
+    icao = np.where(surveillance, address, headers['icao'])[selected]
+    adsb = is_adsb[selected]
+
+    # строки каждого борта подряд, в порядке файла
+    order = np.argsort(icao, kind='stable')
+    unique, first = np.unique(icao[order], return_index=True)
+    bounds = np.append(first, len(order))
+    for aa, lo, hi in zip(icao_to_str(unique).tolist(), bounds[:-1], bounds[1:]):
+        rows = selected[order[lo:hi]]
+        offsets.setdefault(aa, []).append(starts[rows] + base)
+        lengths.setdefault(aa, []).append((ends[rows] - starts[rows]).astype(np.uint16))
+
+        # время первого и последнего ads-b сообщения
+        adsb_rows = rows[adsb[order[lo:hi]]]
+        if len(adsb_rows) == 0:
+            continue
+        times = index.times.setdefault(aa, [int(timestamps[adsb_rows[0]]), 0])
+        times[1] = int(timestamps[adsb_rows[-1]])
+
+    # позывные (tc 1-4)
+    tc = headers['tc'][selected]
+    for i in selected[adsb & (tc >= 1) & (tc <= 4)].tolist():
+        rec = decode_message(messages[i])
+        if rec is not None and rec['callsign']:
+            index.callsigns[rec['icao']] = rec['callsign']
+
+    return int(seconds[-1])
+
+# сохранение индекса в сжатом виде: смещения строк борта хранятся разностями
+def save_index(index, file_path, key):
+    icaos = list(index.offsets)
+    arrays = {
+        '__version': np.array(INDEX_VERSION),
+        '__size': np.array(key['size']),
+        '__mtime': np.array(key['mtime']),
+        '__hash': np.array(key['hash']),
+        'icao': np.array(icaos, dtype='<U6'),
+        'count': np.array([len(index.offsets[aa]) for aa in icaos], dtype=np.int64),
+        'offset_delta': np.concatenate([np.diff(index.offsets[aa], prepend=0) for aa in icaos])
+                        if icaos else np.empty(0, dtype=np.int64),
+        'length': np.concatenate([index.lengths[aa] for aa in icaos])
+                  if icaos else np.empty(0, dtype=np.uint16),
+        'times:icao': np.array(list(index.times), dtype='<U6'),
+        'times:value': np.array(list(index.times.values()), dtype=np.int64).reshape(-1, 2),
+        'callsigns:key': np.array(list(index.callsigns), dtype='<U6'),
+        'callsigns:value': np.array(list(index.callsigns.values()), dtype=str),
+        'bucket:second': index.bucket_seconds,
+        'bucket:offset_delta': np.diff(index.bucket_offsets, prepend=0),
+        'rejected:offset': index.rejected_offsets,
+        'rejected:time': index.rejected_times,
+    }
+
+    # запись во временный файл и замена, чтобы не оставить повреждённый файл
+    path = index_path(file_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+
+# загрузка индекса, если он соответствует исходному файлу; иначе None
+def load_index(file_path, key):
+    path = index_path(file_path)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        data = np.load(path, allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+
+    with data:
+        try:
+            if (int(data['__version']) != INDEX_VERSION or int(data['__size']) != key['size']
+                    or int(data['__mtime']) != key['mtime'] or str(data['__hash']) != key['hash']):
+                return None
+        except KeyError:
+            return None
+
+        index = OffsetIndex()
+        bounds = np.concatenate(([0], np.cumsum(data['count'])))
+        offset_delta = data['offset_delta']
+        length = data['length']
+        for k, aa in enumerate(data['icao'].tolist()):
+            index.offsets[aa] = np.cumsum(offset_delta[bounds[k]:bounds[k + 1]])
+            index.lengths[aa] = length[bounds[k]:bounds[k + 1]]
+        for aa, (first, last) in zip(data['times:icao'].tolist(), data['times:value'].tolist()):
+            index.times[aa] = [first, last]
+        index.callsigns.update(zip(data['callsigns:key'].tolist(), data['callsigns:value'].tolist()))
+        index.bucket_seconds = data['bucket:second']
+        index.bucket_offsets = np.cumsum(data['bucket:offset_delta'])
+        index.rejected_offsets = data['rejected:offset']
+        index.rejected_times = data['rejected:time']
+    return index
+
+# индекс из файла рядом с логом; если его нет или он устарел - строится заново
+# и сохраняется (use_file=False - только в памяти)
+def open_index(file_path, use_file=True):
+    key = index_key(file_path)
+    index = load_index(file_path, key) if use_file else None
+    if index is None:
+        index = build_index(file_path)
+        if use_file:
+            try:
+                save_index(index, file_path, key)
+            except OSError as e:
+                print(f"Не удалось сохранить файл {index_path(file_path)}: {e}")
+    return index
@@ -0,0 +1,110 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from aircraft_store import AircraftStore
+from bulk_cpr import cpr_fields
+from parsing import parse_log_block, decode_cache, decode_message, SURVEILLANCE_LENGTHS
+from processing import (batch_headers, decode_rows, process_message, process_mode_a,
+                        resolve_batch_cpr, last_cpr_frames)
+
+# число частей файла на один рабочий процесс (для равномерной загрузки)
+CHUNKS_PER_WORKER = 4
+
+# разбиение файла на диапазоны байт по границам строк
+def split_file(file_path, n_chunks):
+    size = os.path.getsize(file_path)
+    bounds = [0]
+    with open(file_path, "rb") as f:
+        for i in range(1, n_chunks):
+            f.seek(size * i // n_chunks)
+            # дочитываем до конца текущей строки
+            f.readline()
+            pos = f.tell()
+            if bounds[-1] < pos < size:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _init_worker(cache_size):
+    decode_cache.resize(cache_size)
+
+# обработка одного диапазона байт в рабочем процессе без состояния предыдущих частей.
+# данные, не зависящие от предыдущих частей, накапливаются в хранилище части; зависящие
+# от них возвращаются столбцами и учитываются при объединении частей в порядке файла:
+# - cpr поля сообщений о положении в воздухе (координаты определяются по всем частям сразу)
+#   и последние чётное и нечётное сообщения бортов;
+# - коды mode a (tc 28) для признака смены кода;
+# - ответы наблюдения (df 4/5/20/21) от бортов, ads-b сообщений которых в этой части
+#   до ответа не было: принимаются, если борт известен по предыдущим частям
+def _process_chunk(task):
+    file_path, start, end = task
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    timestamps, messages = parse_log_block(data)
+
+    part = AircraftStore()
+    matrix, headers, adsb, address, (part.crc_corrected, part.crc_rejected) = batch_headers(messages)
+    df = headers['df']
+    # ответы наблюдения от бортов с ads-b сообщениями в этой части декодируются здесь
+    surveillance = address >= 0
+    local = surveillance & np.isin(address, headers['icao'][adsb])
+    icao = np.where(surveillance, address, headers['icao'])
+    indices, records = decode_rows(messages, np.flatnonzero((df == 11) | adsb | local), icao, headers)
+
+    pending = np.flatnonzero(surveillance & ~local).tolist()
+    cpr_rows, status = [], []
+    for i, rec in zip(indices, records):
+        tc = rec['tc']
+        if rec['df'] in SURVEILLANCE_LENGTHS and rec['icao'] not in part.icao_list:
+            pending.append(i)
+            continue
+        if tc is not None and 9 <= tc <= 18:
+            cpr_rows.append(i)
+        elif tc == 28 and not rec['tcas_ra'] and rec['squawk'] is not None:
+            status.append((rec['icao'], timestamps[i], rec['squawk']))
+        process_message(part, timestamps[i], messages[i], rec, cpr=False, mode_a=False)
+
+    t = np.asarray(timestamps, dtype=np.int64)
+    cpr_rows = np.array(cpr_rows, dtype=np.intp)
+    oe = headers['oe_flag'][cpr_rows]
+    cpr = (headers['icao'][cpr_rows], t[cpr_rows], oe, *cpr_fields(matrix[cpr_rows]))
+    frames = last_cpr_frames(cpr[0], oe, cpr[1], [messages[i] for i in cpr_rows.tolist()])
+
+    pending.sort()
+    pending = (t[pending], address[pending], [messages[i] for i in pending])
+    return part, cpr, frames, status, pending
+
+# параллельная обработка файла: части файла обрабатываются в пуле процессов целиком
+# (векторное декодирование и накопление рядов), затем объединяются по порядку файла.
+# последовательно выполняется только то, что зависит от предыдущих частей: ответы
+# наблюдения от бортов из предыдущих частей и смена кода mode a; координаты всех частей
+# определяются одним векторным проходом. результат совпадает с однопоточным чтением
+def process_file_parallel(store, file_path, jobs, cache_size=None):
+    if cache_size is None:
+        cache_size = decode_cache.maxsize
+    chunks = split_file(file_path, jobs * CHUNKS_PER_WORKER)
+    tasks = [(file_path, start, end) for start, end in chunks]
+
+    cpr_parts = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(cache_size,)) as pool:
+        for part, cpr, frames, status, (t, address, messages) in pool.map(_process_chunk, tasks):
+            # ответы наблюдения от бортов, известных по предыдущим частям (до данных части)
+            known = np.array([int(aa, 16) for aa in store.icao_list], dtype=np.int64)
+            for k in np.flatnonzero(np.isin(address, known)).tolist():
+                rec = decode_message(messages[k])
+                if rec is not None:
+                    process_message(store, int(t[k]), messages[k], rec)
+            store.extend_from(part)
+
+            for aa, timestamp, squawk in status:
+                process_mode_a(store, aa, timestamp, squawk)
+            cpr_parts.append(cpr)
+            for aa, (even, odd) in frames.items():
+                last = store.cpr_messages.setdefault(aa, [None, None])
+                last[0] = even or last[0]
+                last[1] = odd or last[1]
+
+    if cpr_parts:
+        resolve_batch_cpr(store, *(np.concatenate(columns) for columns in zip(*cpr_parts)))
@@ -1,6 +1,20 @@
+import os
+import re
 import pyModeS as pms
 import numpy as np
 from dict_data import *
+from lru import LRUCache
+from time_formatter import parse_timestamp_ns, NS_PER_SEC
+
+# размер кэша декодированных сообщений по умолчанию
+DEFAULT_CACHE_SIZE = 100000
+
+# кэш декодированных записей по hex строке сообщения
+decode_cache = LRUCache(DEFAULT_CACHE_SIZE)
+
+# ответы наблюдения mode s (df 4/5 - короткие, df 20/21 - длинные): длина hex сообщения.
+# адрес борта в них не передаётся явно, а сложен с crc в поле чётности (ap)
+SURVEILLANCE_LENGTHS = {4: 14, 5: 14, 20: 28, 21: 28}
 
 # парсинг одной строки из файла с данными
 def parse_ads_b_line(line):
@@ -8,7 +22,7 @@ def parse_ads_b_line(line):
     if len(parts) < 2:
         return None
     try:
-        timestamp = np.float64(parts[0])
+        timestamp = parse_timestamp_ns(parts[0])
     except ValueError:
         return None
     
@@ -26,162 +40,268 @@ def parse_ads_b_line(line):
     
     return timestamp, message_spaced, message_str
 
-# извлечение барометрической высоты из сообщения
-def get_altitude(msg_str):
-    try:
-        # это ads-b сообщение
-        df = pms.df(msg_str)
-        if df not in [17, 18]: 
+# размер блока при чтении файла в двоичном режиме (байт)
+READ_BLOCK = 1 << 20
+
+# строка лога в двоичном виде: время "секунды.доли", необязательное поле DF/UF
+# и группы hex символов, разделённые пробелами
+_WS = rb'[ \t\r\v\f]'
+LOG_LINE_RE = re.compile(
+    rb'^' + _WS + rb'*(\d+)(?:\.(\d*))?' + _WS + rb'+(?:(?:DF|UF)' + _WS + rb'+)?'
+    rb'([0-9A-Fa-f][0-9A-Fa-f \t\r\v\f]*)$', re.M)
+
+# перевод hex символов в верхний регистр с удалением пробелов за один проход
+_HEX_UPPER = bytes.maketrans(b'abcdef', b'ABCDEF')
+_WS_BYTES = b' \t\r\v\f'
+
+# разбор блока байт из файла (целые строки) без построения промежуточных строк:
+# все подходящие строки находятся одним регулярным выражением, некорректные пропускаются.
+# возвращает списки времён (нс) и hex сообщений; with_offsets - также список
+# смещений начала каждой строки в блоке
+def parse_log_block(data, with_offsets=False):
+    if with_offsets:
+        matches = list(LOG_LINE_RE.finditer(data))
+        groups = [m.groups(b'') for m in matches]
+    else:
+        groups = LOG_LINE_RE.findall(data)
+
+    timestamps, messages, offsets = [], [], []
+    for k, (sec, frac, hex_part) in enumerate(groups):
+        message = hex_part.translate(_HEX_UPPER, _WS_BYTES).decode()
+        if len(frac) == 9:
+            timestamps.append(int(sec + frac))
+        else:
+            timestamps.append(int(sec) * NS_PER_SEC + int(frac[:9].ljust(9, b'0')))
+        messages.append(message)
+        if with_offsets:
+            offsets.append(matches[k].start())
+    if with_offsets:
+        return timestamps, messages, offsets
+    return timestamps, messages
+
+# чтение файла логов блоками в двоичном режиме: пары (время в нс, hex сообщение)
+def read_log(file_path, block_size=READ_BLOCK):
+    tail = b""
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            data = tail + block
+            # последняя неполная строка переносится в следующий блок
+            end = data.rfind(b"\n") + 1
+            tail = data[end:]
+            yield from zip(*parse_log_block(data[:end]))
+    if tail:
+        yield from zip(*parse_log_block(tail))
+
+# множество icao адресов из аргумента -a: адреса через запятую или пробел
+# либо путь к файлу с адресами (по одному или несколько в строке, # - комментарий)
+def parse_icao_set(value):
+    if os.path.isfile(value):
+        with open(value, "r") as f:
+            text = ' '.join(line.partition('#')[0] for line in f)
+    else:
+        text = value
+    icaos = set()
+    for token in text.replace(',', ' ').split():
+        token = token.upper()
+        if len(token) != 6 or any(c not in "0123456789ABCDEF" for c in token):
+            raise ValueError(f"некорректный ICAO адрес: {token}")
+        icaos.add(token)
+    if not icaos:
+        raise ValueError(f"не задано ни одного ICAO адреса: {value}")
+    return frozenset(icaos)
+
+# декодирование сообщения в одну запись со всеми полями
+# (df, icao, tc, подтип, высота, скорость, статус), каждое поле вычисляется один раз.
+# header - уже известные поля заголовка (df, icao, tc, subtype, oe_flag, mb),
+# например из пакетного декодера bulk_decode, тогда они не пересчитываются.
+# одинаковые сообщения повторяются в логе постоянно, поэтому результат кэшируется;
+# запись общая для всех обращений и не должна изменяться
+def decode_message(msg_str, header=None):
+    rec = decode_cache.get(msg_str)
+    if rec is not None:
+        return rec
+
+    rec = _decode_message(msg_str, header)
+    if rec is not None:
+        decode_cache.put(msg_str, rec)
+    return rec
+
+def _decode_message(msg_str, header=None):
+    if header is not None:
+        rec = dict(header)
+    else:
+        rec = _decode_header(msg_str)
+        if rec is None:
             return None
-        # сообщение о положении (тип 9-18 или 20-22)
-        tc = pms.adsb.typecode(msg_str)
-        if 9 <= tc <= 18 or 20 <= tc <= 22:
-            return pms.adsb.altitude(msg_str)
-        return None
-    except:
-        return None
 
-# извлечение скорости из сообщения
-def get_velocity(msg_str):
+    if rec['df'] in SURVEILLANCE_LENGTHS:
+        if rec['icao'] is not None:
+            _decode_surveillance(msg_str, rec)
+        return rec
+
+    tc = rec['tc']
+    if tc is None:
+        return rec
+
+    if 9 <= tc <= 18 or 20 <= tc <= 22:
+        _decode_position(msg_str, tc, rec)
+    elif 1 <= tc <= 4:
+        _decode_identification(msg_str, rec)
+    elif tc == 19:
+        _decode_velocity(msg_str, rec)
+    elif tc == 28:
+        _decode_aircraft_status(msg_str, rec)
+    elif tc == 29:
+        _decode_target_state(msg_str, rec)
+
+    return rec
+
+# поля заголовка одного сообщения средствами pyModeS
+def _decode_header(msg_str):
     try:
         df = pms.df(msg_str)
-        if df not in [17, 18]: 
-            return None
-        # сообщение о скорости (тип 19)
-        tc = pms.adsb.typecode(msg_str)
-        if tc == 19:
-            result = pms.adsb.velocity(msg_str)
-            if result and result[0] is not None:
-                return result[0]
-        return None
-    except:
+    except Exception:
         return None
 
-# функция извлекает курс из сообщения
-def get_course(msg_str):
+    rec = {'df': df, 'icao': None, 'tc': None, 'subtype': None}
+
+    # адрес ответа наблюдения - из поля чётности (только при правильной длине)
+    if df in SURVEILLANCE_LENGTHS:
+        if len(msg_str) == SURVEILLANCE_LENGTHS[df]:
+            rec['icao'] = pms.icao(msg_str)
+        return rec
+
+    if df not in (11, 17, 18):
+        return rec
+
     try:
-        df = pms.df(msg_str)
-        if df not in [17, 18]: 
-            return None
-        # сообщение о скорости (тип 19)
-        tc = pms.adsb.typecode(msg_str)
-        if tc == 19:
-            _, heading, _, _ = pms.adsb.velocity(msg_str)
-            return heading
-        return None
-    except:
-        return None
-    
-def get_track_angle(msg_str):
+        rec['icao'] = pms.icao(msg_str)
+    except Exception:
+        return rec
+
+    if df == 11:
+        return rec
+
     try:
-        df = pms.df(msg_str)
-        if df not in [17, 18]: 
-            return None
+        rec['tc'] = pms.adsb.typecode(msg_str)
+    except Exception:
+        return rec
 
-        tc = pms.adsb.typecode(msg_str)
-        if tc != 19:
-            return None
+    # подтип (биты 37-39), нужен для tc 19, 28, 29, 31
+    if rec['tc'] is not None and len(msg_str) >= 10:
+        rec['subtype'] = int(msg_str[9], 16) & 0x7
+
+    return rec
+
+# сообщения о положении в воздухе (tc 9-18) и с GNSS высотой (tc 20-22)
+def _decode_position(msg_str, tc, rec):
+    try:
+        rec['altitude'] = pms.adsb.altitude(msg_str)
+    except Exception:
+        rec['altitude'] = None
+
+    if 9 <= tc <= 18 and 'oe_flag' not in rec:
+        rec['oe_flag'] = pms.adsb.oe_flag(msg_str)
 
-        # данные о скорости
+# ответы наблюдения: высота (df 4/20) или код ответчика mode a (df 5/21),
+# у ответов comm-b (df 20/21) также поле mb (56 бит) для определения регистра
+def _decode_surveillance(msg_str, rec):
+    if rec['df'] in (20, 21) and 'mb' not in rec:
+        rec['mb'] = int(msg_str[8:22], 16)
+    if rec['df'] in (4, 20):
+        try:
+            rec['altitude'] = pms.common.altcode(msg_str)
+        except Exception:
+            rec['altitude'] = None
+    else:
+        try:
+            rec['squawk'] = pms.common.idcode(msg_str)
+        except Exception:
+            rec['squawk'] = None
+
+# сообщения идентификации (tc 1-4)
+def _decode_identification(msg_str, rec):
+    try:
+        callsign = pms.adsb.callsign(msg_str)
+    except Exception:
+        callsign = None
+    # очищаем позывной от лишних символов
+    rec['callsign'] = ''.join(c for c in callsign if c.isalnum()) if callsign else None
+
+# сообщения о скорости (tc 19)
+def _decode_velocity(msg_str, rec):
+    rec['velocity'] = None
+    rec['gs'] = None
+    rec['course'] = None
+    rec['track_angle'] = None
+    rec['alt_diff'] = None
+
+    try:
         v_data = pms.adsb.velocity(msg_str, source=True)
-        if not v_data:
-            return None
-        
-        # количество возвращенных значений
-        if len(v_data) >= 6:
-            speed, angle, vert_rate, speed_type, dir_source, vr_source = v_data[:6]
-        else:
-            # без source в случае ошибки
-            v_data_simple = pms.adsb.velocity(msg_str, source=False)
-            if not v_data_simple or len(v_data_simple) < 4:
-                return None
-            speed, angle, vert_rate, speed_type = v_data_simple[:4]
-            dir_source = None
-            vr_source = None
+    except Exception:
+        v_data = None
 
+    if v_data:
+        speed, angle, vert_rate, speed_type = v_data[:4]
+        rec['velocity'] = (speed, angle, vert_rate, speed_type)
+        rec['gs'] = speed
+        rec['course'] = angle
+        # путевой угол только для скорости относительно земли
         if speed_type == 'GS':
-            return angle
-        
-        return None
-    except Exception as e:
-        return None
+            rec['track_angle'] = angle
+
+    try:
+        altitude_diff = pms.adsb.altitude_diff(msg_str)
+    except Exception:
+        altitude_diff = None
+    if altitude_diff is not None and -2500 <= altitude_diff <= 2500:
+        rec['alt_diff'] = altitude_diff
+
+# статус воздушного судна (tc 28)
+def _decode_aircraft_status(msg_str, rec):
+    rec['squawk'] = None
+    rec['is_emergency'] = False
+
+    # TCAS RA (subtype 2)
+    try:
+        rec['tcas_ra'] = bool(pms.adsb.tcas_ra(msg_str))
+    except Exception:
+        rec['tcas_ra'] = False
+    if rec['tcas_ra']:
+        return
+
+    # остальные подтипы (0 и 1), ошибка ACAS-RA пропускается
+    try:
+        rec['squawk'] = pms.adsb.emergency_squawk(msg_str)
+    except Exception:
+        return
+
+    if rec['squawk'] is not None:
+        try:
+            rec['is_emergency'] = pms.adsb.is_emergency(msg_str)
+        except Exception:
+            rec['is_emergency'] = False
+
+# состояние и статус цели (tc 29)
+def _decode_target_state(msg_str, rec):
+    rec['selected_altitude'] = None
+    rec['baro_correction'] = None
 
-# функция извлекает выбранную на автопилоте высоту и режимы
-def get_selected_altitude(msg_str):
     try:
-        df = pms.df(msg_str)
-        if df not in [17, 18]: 
-            return None
-        # проверяем, что это сообщение о статусе (тип 29)
-        tc = pms.adsb.typecode(msg_str)
-        if tc != 29: return None
         sel_alt_info = pms.adsb.selected_altitude(msg_str)
-        if sel_alt_info is None: return None
+    except Exception:
+        sel_alt_info = None
+    if sel_alt_info is not None:
         selected_alt, raw_modes = sel_alt_info
         if selected_alt is not None and -2000 <= selected_alt <= 50000:
             # переводим режимы в понятные сокращения
             processed_modes = {MODE_MAP.get(m, m) for m in raw_modes}
-            return selected_alt, processed_modes
-        return None
-    except Exception as e:
-        return None
-
-# получение разности высот
-def get_altitude_difference(msg_str):
-    try:
-        df = pms.df(msg_str)
-        if df not in [17, 18]: 
-            return None
-        # проверяем, что это сообщение о скорости (тип 19)
-        tc = pms.adsb.typecode(msg_str)
-        if tc != 19:
-            return None
-        
-        altitude_diff = pms.adsb.altitude_diff(msg_str)
-        if altitude_diff is not None and -2500 <= altitude_diff <= 2500:
-            return altitude_diff
-        
-        return None
-    except Exception as e:
-        return None
+            rec['selected_altitude'] = (selected_alt, processed_modes)
 
-# получение барокоррекции
-def get_baro_correction(msg_str):
     try:
-        df = pms.df(msg_str)
-        if df not in [17, 18]: 
-            return None
-        # проверяем, что это сообщение о статусе (тип 29)
-        tc = pms.adsb.typecode(msg_str)
-        if tc != 29:
-            return None
-        
         baro_setting = pms.adsb.baro_pressure_setting(msg_str)
-        
-        if baro_setting is not None:
-            # разумные пределы для атмосферного давления
-            if 800 <= baro_setting <= 1100:
-                return baro_setting
-                
-        return None
-        
-    except Exception as e:
-        return None
-
-# функция извлекает позывной (callsign)
-def get_callsign(msg_str):
-    try:
-        df = pms.df(msg_str)
-        if df not in [17, 18]: 
-            return None
-        # проверяем, что это сообщение идентификации (тип 1-4)
-        tc = pms.adsb.typecode(msg_str)
-        if 1 <= tc <= 4:
-            callsign = pms.adsb.callsign(msg_str)
-            if not callsign: 
-                return None
-            # очищаем позывной от лишних символов
-            return ''.join(c for c in callsign if c.isalnum())
-        return None
-    except:
-        return None
\ No newline at end of file
+    except Exception:
+        baro_setting = None
+    # разумные пределы для атмосферного давления
+    if baro_setting is not None and 800 <= baro_setting <= 1100:
+        rec['baro_correction'] = baro_setting
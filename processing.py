@@ -0,0 +1,398 @@
+import pyModeS as pms
+import numpy as np
+from aircraft_store import *
+from parsing import *
+from bulk_decode import *
+from bulk_cpr import *
+from bulk_commb import commb_fields, infer_bds, reference_values, BDS40, BDS50, BDS60
+from bulk_crc import (correct_message, correct_messages, CRC_CORRECTED, CRC_REJECTED,
+                      message_lengths, recover_addresses, surveillance_address)
+from time_formatter import NS_PER_SEC
+
+pms_pos = pms.adsb.position
+pms_pos_ref = pms.adsb.airborne_position_with_ref
+
+# длительность признака смены mode a после изменения кода (нс)
+MODE_A_CHANGE_DURATION = 24_500_000_000
+
+# координаты из cpr сообщения о положении в воздухе: первое определение и периодическая
+# перепроверка - глобально по паре из чётного и нечётного сообщений, остальные сообщения
+# декодируются локально относительно последних известных координат
+def process_cpr(store, aa, timestamp, message_str, oe_flag):
+    cpr_messages = store.cpr_messages
+    cpr_messages.setdefault(aa, [None, None])
+    cpr_messages[aa][oe_flag] = (message_str, timestamp)
+
+    pos = None
+    # опорные координаты: (широта, долгота, время, время глобального определения)
+    ref = store.cpr_reference.get(aa)
+    # устаревшие опорные координаты удаляются, следующие определяются глобально
+    if ref is not None and timestamp - ref[2] > CPR_REFERENCE_MAX_AGE:
+        del store.cpr_reference[aa]
+        ref = None
+    global_t = ref[3] if ref is not None else None
+    # если получены оба сообщения (чётное и нечётное) в пределах 10 секунд
+    if (ref is None or timestamp - global_t >= CPR_GLOBAL_INTERVAL) and all(cpr_messages[aa]):
+        msg0, t0 = cpr_messages[aa][0]
+        msg1, t1 = cpr_messages[aa][1]
+        if abs(t0 - t1) < CPR_PAIR_MAX_DT:
+            pos = pms_pos(msg0, msg1, t0, t1)
+            if pos:
+                global_t = timestamp
+    if not pos and ref is not None:
+        pos = pms_pos_ref(message_str, ref[0], ref[1])
+    if pos:
+        store.append('positions', aa, timestamp, pos[0], pos[1])
+        store.cpr_reference[aa] = (pos[0], pos[1], timestamp, global_t)
+
+# признак смены кода mode a (tc 28): держится MODE_A_CHANGE_DURATION после изменения
+# кода, кроме смены на 1000 и коды особых ситуаций
+def process_mode_a(store, aa, timestamp, squawk):
+    last_mode_a = store.last_mode_a
+    change_event_start = store.change_event_start
+    prev = last_mode_a.get(aa)
+    if prev is not None and squawk != prev:
+        if squawk not in ("1000", "7500", "7600", "7700"):
+            change_event_start[aa] = timestamp
+
+    if aa in change_event_start and (timestamp - change_event_start[aa] <= MODE_A_CHANGE_DURATION):
+        store.append('mode_a_ts', aa, timestamp)
+
+    last_mode_a[aa] = squawk
+
+# обработка одной декодированной записи: накопление данных по бортам.
+# cpr=False - координаты не декодируются (их декодирует векторно process_batch),
+# mode_a=False - не отслеживается смена кода mode a (её учитывает вызывающий код)
+def process_message(store, timestamp, message_str, rec, target_icaos=None, cpr=True, mode_a=True):
+    df = rec['df']
+    aa = rec['icao']
+
+    if df == 11:
+        if aa is None:
+            return
+        if target_icaos and aa not in target_icaos:
+            return
+        store.append('acq_ts', aa, timestamp)
+        return
+
+    # ответы наблюдения: адрес восстановлен из поля чётности и принимается, только если
+    # от борта уже были ads-b сообщения (иначе это адрес, искажённый ошибкой в сообщении)
+    if df in SURVEILLANCE_LENGTHS:
+        if aa is None or aa not in store.icao_list:
+            return
+        if target_icaos and aa not in target_icaos:
+            return
+        if df in (4, 20):
+            alt = rec['altitude']
+            if alt is not None and -1000 <= alt <= 50000:
+                store.append('surv_altitude', aa, timestamp, alt)
+        else:
+            squawk = rec['squawk']
+            if squawk is not None:
+                store.append('surv_identity', aa, timestamp, int(squawk))
+        # регистр comm-b определяется позже по всем ответам борта (update_commb)
+        if df in (20, 21) and rec['mb']:
+            store.append('commb', aa, timestamp, rec['mb'])
+        return
+
+    # только ads-b сообщения
+    if df not in (17, 18): 
+        return 
+
+    if aa is None:
+        return
+
+    # фильтрация по заданным бортам
+    if target_icaos and aa not in target_icaos:
+        return
+
+    # время первого/последнего сообщения для борта
+    store.touch(aa, timestamp)
+
+    tc = rec['tc']
+    if tc is None:
+        return
+
+    if 5 <= tc <= 8:
+        store.append('surface_pos_ts', aa, timestamp)
+
+    # сообщения с высотой и координатами (tc 9-18)
+    elif 9 <= tc <= 18:
+        store.append('airborne_pos_ts', aa, timestamp)
+
+        alt = rec['altitude']
+        if alt is not None and -1000 <= alt <= 50000:
+            store.append('altitude', aa, timestamp, alt, ALT_BARO)
+
+        if cpr:
+            process_cpr(store, aa, timestamp, message_str, rec['oe_flag'])
+
+    # сообщения с позывным (tc 1-4)
+    elif 1 <= tc <= 4:
+        store.append('ident_ts', aa, timestamp)
+        cs = rec['callsign']
+        if cs: 
+            store.callsigns[aa] = cs
+
+    elif tc == 19:
+        store.append('spd_ts', aa, timestamp)
+
+        if rec['velocity'] is None:
+            return
+
+        subtype = rec['subtype']
+        angle = rec['velocity'][1]
+
+        if subtype == 1:
+            store.append('gs_angles', aa, timestamp, angle)
+        elif subtype == 3:
+            store.append('airspd_angles', aa, timestamp, angle)
+
+        gs = rec['gs']
+        if gs is not None and 0 <= gs <= 1000:
+            store.append('speed', aa, timestamp, gs)
+
+        track_angle = rec['track_angle']
+        if track_angle is not None:
+            store.append('track_angles', aa, timestamp, track_angle)
+
+        course = rec['course']
+        if course is not None:
+            store.append('courses', aa, timestamp, course)
+
+        # разница высот
+        alt_diff = rec['alt_diff']
+        if alt_diff is not None:
+            store.append('altitude_difference', aa, timestamp, alt_diff)
+            store.has_gnss.add(aa)
+
+    # сообщения с GNSS высотой
+    elif 20 <= tc <= 22:
+        store.append('airborne_pos_ts', aa, timestamp)
+
+        alt = rec['altitude']
+        if alt is not None and -1000 <= alt <= 50000:
+            store.append('altitude', aa, timestamp, alt, ALT_GNSS)
+            store.has_gnss.add(aa)
+
+    elif tc == 28:
+        # TCAS RA (subtype 2)
+        if rec['tcas_ra']:
+            store.append('tcas_ts', aa, timestamp)
+            return
+
+        # остальные подтипы (0 и 1)
+        squawk = rec['squawk']
+        if squawk is not None:
+            if rec['is_emergency']:
+                store.append('emg_ts', aa, timestamp)
+            else:
+                store.append('status_ts', aa, timestamp)
+            if mode_a:
+                process_mode_a(store, aa, timestamp, squawk)
+
+    elif tc == 29:
+        store.append('target_state_ts', aa, timestamp)
+        sel_alt = rec['selected_altitude']
+        if sel_alt:
+            sel_alt_value, modes = sel_alt
+            store.append('selected_altitude', aa, timestamp, sel_alt_value)
+            store.has_selected_alt.add(aa)
+            store.modes[aa] = store.modes.get(aa, set()).union(modes)
+
+        # барокоррекция
+        baro_corr = rec['baro_correction']
+        if baro_corr is not None:
+            store.append('baro_correction', aa, timestamp, baro_corr)
+
+    elif tc == 31:
+        subtype = rec['subtype']
+
+        if subtype == 0:
+            store.append('air_op_status_ts', aa, timestamp)
+        elif subtype == 1:
+            store.append('surf_op_status_ts', aa, timestamp)
+
+# обработка одного разобранного сообщения (время в нс и hex строка)
+def process_record(store, timestamp, message_str, target_icaos=None):
+    df = int(message_str[:2], 16) >> 3
+    # проверка crc ads-b сообщения, ошибка в одном бите исправляется
+    if df in (17, 18):
+        message_str, status = correct_message(message_str)
+        if status == CRC_REJECTED:
+            store.crc_rejected += 1
+            return
+        if status == CRC_CORRECTED:
+            store.crc_corrected += 1
+    # ответы наблюдения от бортов, неизвестных по ads-b, отбрасываются до декодирования
+    elif df in SURVEILLANCE_LENGTHS and surveillance_address(message_str) not in store.icao_list:
+        return
+
+    # декодирование сообщения в одну запись
+    rec = decode_message(message_str)
+    if rec is None:
+        return
+
+    process_message(store, timestamp, message_str, rec, target_icaos)
+
+# пакетное декодирование: заголовки всех сообщений декодируются векторно,
+# pyModeS вызывается только для полей, которым он действительно нужен.
+# crc ads-b сообщений проверяется векторно, исправленные сообщения заменяются в messages.
+# адреса ответов наблюдения (df 4/5/20/21) восстанавливаются векторно; если задано
+# множество known (борты, уже известные по ads-b), остаются только ответы от них
+# и от бортов с ads-b сообщениями в этом же пакете.
+# возвращает индексы нужных сообщений, их записи и число исправленных и отброшенных
+# по crc сообщений
+def decode_batch(messages, target_icaos=None, known=None):
+    matrix, headers, adsb, address, crc_counts = batch_headers(messages)
+    df = headers['df']
+    surveillance = address >= 0
+    if known is not None:
+        known = np.concatenate((np.array([int(a, 16) for a in known], dtype=np.int64),
+                                headers['icao'][adsb]))
+        surveillance &= np.isin(address, known)
+    icao = np.where(surveillance, address, headers['icao'])
+
+    selected = (df == 11) | adsb | surveillance
+    if target_icaos:
+        selected &= np.isin(icao, [int(a, 16) for a in target_icaos])
+    selected = np.flatnonzero(selected)
+    indices, records = decode_rows(messages, selected, icao, headers)
+    return indices, records, crc_counts
+
+# векторная часть пакетного декодирования: проверка crc ads-b сообщений (исправленные
+# заменяются в messages), восстановление адресов ответов наблюдения и поля mb.
+# возвращает матрицу байт, поля заголовков (с полем mb ответов comm-b), признак ads-b
+# сообщений, прошедших проверку,
+# адреса ответов наблюдения (-1 - не ответ наблюдения) и число исправленных и
+# отброшенных по crc сообщений
+def batch_headers(messages):
+    matrix, corrected, rejected = correct_messages(messages)
+    headers = decode_headers(matrix)
+    df = headers['df']
+    adsb = ((df == 17) | (df == 18)) & ~rejected
+    address = recover_addresses(matrix, df, message_lengths(messages))
+    headers['mb'] = commb_fields(matrix)
+    return matrix, headers, adsb, address, (int(corrected.sum()), int(rejected.sum()))
+
+# записи сообщений с индексами selected (icao - адреса всех сообщений пакета):
+# заголовки берутся из векторного декодирования, остальные поля - из decode_message
+def decode_rows(messages, selected, icao, headers):
+    df = headers['df']
+    icao_str = icao_to_str(icao[selected]).tolist()
+    df_sel = df[selected].tolist()
+    tc_sel = headers['tc'][selected].tolist()
+    subtype_sel = headers['subtype'][selected].tolist()
+    oe_sel = headers['oe_flag'][selected].tolist()
+    mb_sel = headers['mb'][selected].tolist()
+
+    indices = selected.tolist()
+    records = []
+    for k, i in enumerate(indices):
+        header = {'df': df_sel[k], 'icao': icao_str[k], 'tc': None, 'subtype': None}
+        if header['df'] in (17, 18):
+            header['tc'] = tc_sel[k]
+            header['subtype'] = subtype_sel[k]
+            header['oe_flag'] = oe_sel[k]
+        elif header['df'] in (20, 21):
+            header['mb'] = mb_sel[k]
+        records.append(decode_message(messages[i], header))
+    return indices, records
+
+# векторное декодирование координат сообщений о положении в воздухе (индексы в messages)
+# бортов без предыдущего состояния cpr; состояние после последнего сообщения
+# сохраняется в хранилище, как при последовательной обработке
+def process_batch_cpr(store, timestamps, messages, indices):
+    if not indices:
+        return
+    matrix = messages_to_matrix([messages[i] for i in indices])
+    headers = decode_headers(matrix)
+    t = np.array([timestamps[i] for i in indices], dtype=np.int64)
+    lat_cpr, lon_cpr = cpr_fields(matrix)
+    resolve_batch_cpr(store, headers['icao'], t, headers['oe_flag'], lat_cpr, lon_cpr)
+    store.cpr_messages.update(last_cpr_frames(headers['icao'], headers['oe_flag'], t,
+                                              [messages[i] for i in indices]))
+
+# координаты по cpr полям (17 бит) сообщений о положении в воздухе бортов без
+# предыдущего состояния cpr (icao - адреса числами, строки в порядке файла):
+# координаты добавляются в хранилище, последние координаты борта остаются опорными
+def resolve_batch_cpr(store, icao, t, oe, lat_cpr, lon_cpr):
+    # строки по бортам, внутри борта - в порядке файла
+    order = np.argsort(icao, kind='stable')
+    icao, t = icao[order], t[order]
+    new_group = np.r_[True, icao[1:] != icao[:-1]]
+    lat, lon, fixed, is_global = resolve_positions(new_group, t, lat_cpr[order], lon_cpr[order], oe[order])
+
+    bounds = np.append(np.flatnonzero(new_group), len(t))
+    for lo, hi, aa in zip(bounds[:-1].tolist(), bounds[1:].tolist(), icao_to_str(icao[new_group]).tolist()):
+        sel = slice(lo, hi)
+        keep = fixed[sel]
+        if keep.any():
+            store.extend('positions', aa, t[sel][keep], lat[sel][keep], lon[sel][keep])
+
+        # координаты остаются опорными, только если последнее сообщение их получило
+        # (иначе перед ним был перерыв и опорные координаты удалены)
+        k = hi - 1
+        if fixed[k]:
+            global_t = t[lo + int(np.flatnonzero(is_global[sel])[-1])]
+            store.cpr_reference[aa] = (float(lat[k]), float(lon[k]), int(t[k]), int(global_t))
+
+# последние чётное и нечётное сообщения о положении каждого борта (строки в порядке
+# файла, messages - их hex строки): icao -> [(msg, t), (msg, t)], None - нет сообщения
+def last_cpr_frames(icao, oe, t, messages):
+    frames = {}
+    for flag in (0, 1):
+        rows = np.flatnonzero(oe == flag)[::-1]
+        unique, first = np.unique(icao[rows], return_index=True)
+        for aa, k in zip(icao_to_str(unique).tolist(), rows[first].tolist()):
+            frames.setdefault(aa, [None, None])[flag] = (messages[k], int(t[k]))
+    return frames
+
+# определение регистров comm-b (bds 4,0 / 5,0 / 6,0) по всем ответам каждого борта:
+# ряды регистров пересчитываются целиком у бортов, у которых добавились ответы comm-b
+# или опорные данные ads-b (путевая скорость, путевой угол, барометрическая высота)
+def update_commb(store):
+    for aa, buf in store.series['commb'].items():
+        state = (len(buf), store.count('speed', aa), store.count('track_angles', aa),
+                 store.count('altitude', aa))
+        if store.commb_inferred.get(aa) == state:
+            continue
+        store.commb_inferred[aa] = state
+
+        t, mb = buf.columns()
+        gs_t, gs = store.get('speed', aa)
+        trk_t, trk = store.get('track_angles', aa)
+        alt_t, alt, source = store.get('altitude', aa)
+        baro = source == ALT_BARO
+        refs = []
+        for ref_t, values in ((gs_t, gs), (trk_t, trk), (alt_t[baro], alt[baro])):
+            order = np.argsort(ref_t, kind='stable')
+            refs.append(reference_values(ref_t[order], values[order], t))
+        codes, fields = infer_bds(mb, *refs)
+
+        # выбранная высота mcp/fcu, при её отсутствии - fms
+        sel = np.where(np.isnan(fields['mcp']), fields['fms'], fields['mcp'])
+        for name, code, values in (('bds40_selected_altitude', BDS40, sel),
+                                   ('bds50_roll', BDS50, fields['roll']),
+                                   ('bds50_tas', BDS50, fields['tas']),
+                                   ('bds60_heading', BDS60, fields['heading']),
+                                   ('bds60_ias', BDS60, fields['ias']),
+                                   ('bds60_mach', BDS60, fields['mach'])):
+            keep = (codes == code) & ~np.isnan(values)
+            store.replace(name, aa, t[keep], values[keep])
+
+# пакетная обработка списка сообщений; координаты бортов, для которых ещё нет
+# состояния cpr, декодируются векторно после остальных полей
+def process_batch(store, timestamps, messages, target_icaos=None):
+    indices, records, (corrected, rejected) = decode_batch(messages, target_icaos, store.icao_list)
+    store.crc_corrected += corrected
+    store.crc_rejected += rejected
+    cpr_indices = []
+    for i, rec in zip(indices, records):
+        tc = rec['tc']
+        bulk = tc is not None and 9 <= tc <= 18 and rec['icao'] not in store.cpr_messages
+        if bulk:
+            cpr_indices.append(i)
+        process_message(store, timestamps[i], messages[i], rec, target_icaos, cpr=not bulk)
+    process_batch_cpr(store, timestamps, messages, cpr_indices)
+    update_commb(store)
@@ -0,0 +1,110 @@
+import os
+import hashlib
+import numpy as np
+from aircraft_store import SERIES, SeriesBuffer
+from offset_index import index_key
+
+# версия формата файла-спутника, увеличивается при изменении обработки
+SIDECAR_VERSION = 8
+
+# путь к файлу-спутнику рядом с логом
+def sidecar_path(file_path):
+    return file_path + ".npz"
+
+# ключ исходного файла: размер, время изменения, хэш содержимого и хэш начала и конца
+# файла (как у индекса смещений строк, для quick_source_key)
+def source_key(file_path):
+    st = os.stat(file_path)
+    h = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 22), b""):
+            h.update(block)
+    return {'size': st.st_size, 'mtime': st.st_mtime_ns, 'hash': h.hexdigest(),
+            'quick_hash': index_key(file_path)['hash']}
+
+# ключ для проверки файла-спутника без чтения всего лога (--lazy): размер, время
+# изменения и хэш начала и конца файла
+def quick_source_key(file_path):
+    key = index_key(file_path)
+    return {'size': key['size'], 'mtime': key['mtime'], 'quick_hash': key['hash']}
+
+# сохранение рядов хранилища в столбцовом виде: для каждого ряда
+# столбцы всех бортов подряд, список бортов и число точек каждого борта
+def save_sidecar(store, file_path, key):
+    arrays = {
+        '__version': np.array(SIDECAR_VERSION),
+        '__size': np.array(key['size']),
+        '__mtime': np.array(key['mtime']),
+        '__hash': np.array(key['hash']),
+        '__quick_hash': np.array(key['quick_hash']),
+    }
+
+    for name, columns in SERIES.items():
+        buffers = {aa: buf for aa, buf in store.series[name].items() if len(buf)}
+        arrays[name + ':icao'] = np.array(list(buffers), dtype='<U6')
+        arrays[name + ':count'] = np.array([len(buf) for buf in buffers.values()], dtype=np.int64)
+        for k, (col, dtype) in enumerate(columns):
+            parts = [buf.columns()[k] for buf in buffers.values()]
+            arrays[f"{name}:{col}"] = np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+    arrays['times:icao'] = np.array(list(store.times), dtype='<U6')
+    arrays['times:value'] = np.array(list(store.times.values()), dtype=np.int64).reshape(-1, 2)
+
+    arrays['callsigns:key'] = np.array(list(store.callsigns), dtype='<U6')
+    arrays['callsigns:value'] = np.array(list(store.callsigns.values()), dtype=str)
+    # режимы автопилота хранятся строкой через запятую
+    arrays['modes:key'] = np.array(list(store.modes), dtype='<U6')
+    arrays['modes:value'] = np.array([','.join(sorted(v)) for v in store.modes.values()], dtype=str)
+
+    arrays['has_selected_alt'] = np.array(sorted(store.has_selected_alt), dtype='<U6')
+    arrays['has_gnss'] = np.array(sorted(store.has_gnss), dtype='<U6')
+    arrays['icao_list'] = np.array(sorted(store.icao_list), dtype='<U6')
+    arrays['crc'] = np.array([store.crc_corrected, store.crc_rejected], dtype=np.int64)
+
+    # запись во временный файл и замена, чтобы не оставить повреждённый файл
+    path = sidecar_path(file_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+# загрузка рядов из файла-спутника в хранилище, если он соответствует исходному файлу
+# (проверяются все поля ключа key: source_key или quick_source_key)
+def load_sidecar(store, file_path, key):
+    path = sidecar_path(file_path)
+    if not os.path.exists(path):
+        return False
+
+    try:
+        data = np.load(path, allow_pickle=False)
+    except (OSError, ValueError):
+        return False
+
+    with data:
+        try:
+            if int(data['__version']) != SIDECAR_VERSION or any(
+                    data['__' + name].item() != value for name, value in key.items()):
+                return False
+        except KeyError:
+            return False
+
+        for name, columns in SERIES.items():
+            icaos = data[name + ':icao'].tolist()
+            bounds = np.concatenate(([0], np.cumsum(data[name + ':count'])))
+            values = [data[f"{name}:{col}"] for col, _ in columns]
+            buffers = store.series[name]
+            for k, aa in enumerate(icaos):
+                buf = buffers[aa] = SeriesBuffer(columns, capacity=bounds[k + 1] - bounds[k])
+                buf.extend(*(v[bounds[k]:bounds[k + 1]] for v in values))
+
+        for aa, (first, last) in zip(data['times:icao'].tolist(), data['times:value'].tolist()):
+            store.times[aa] = [first, last]
+        store.callsigns.update(zip(data['callsigns:key'].tolist(), data['callsigns:value'].tolist()))
+        for aa, v in zip(data['modes:key'].tolist(), data['modes:value'].tolist()):
+            store.modes[aa] = set(v.split(',')) if v else set()
+        store.has_selected_alt.update(data['has_selected_alt'].tolist())
+        store.has_gnss.update(data['has_gnss'].tolist())
+        store.icao_list.update(data['icao_list'].tolist())
+        store.crc_corrected, store.crc_rejected = data['crc'].tolist()
+
+    return True
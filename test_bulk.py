@@ -0,0 +1,174 @@
+import numpy as np
+import pyModeS as pms
+import pytest
+
+from bulk_crc import (CRC_OK, CRC_CORRECTED, CRC_REJECTED, crc_syndromes, crc_syndrome,
+                      correct_adsb, correct_message, recover_addresses, surveillance_address,
+                      message_lengths)
+from bulk_cpr import CPR_SCALE, _NL_EDGES, cpr_nl, cpr_fields, cpr_global, cpr_local
+from bulk_decode import MESSAGE_BYTES, messages_to_matrix, decode_headers
+
+# сообщения ads-b из известных примеров pyModeS
+ADSB_MESSAGES = [
+    '8D40621D58C382D690C8AC2863A7',
+    '8D40621D58C386435CC412692AD6',
+    '8D40058B58C901375147EFD09357',
+    '8D40058B58C904A87F402D3B8C59',
+    '8D406B902015A678D4D220AA4BDA',
+    '8D485020994409940838175B284F',
+]
+
+rng = np.random.default_rng(2026)
+
+
+# сообщение с битом (номер от старшего), инвертированным
+def flip(msg, *bits):
+    value = int(msg, 16)
+    for bit in bits:
+        value ^= 1 << (len(msg) * 4 - 1 - bit)
+    return f"{value:0{len(msg)}X}"
+
+
+# ответ наблюдения формата df со случайными данными и адресом в поле ap
+def surveillance_reply(df, address):
+    n_hex = 14 if df in (4, 5) else 28
+    n_bits = n_hex * 4 - 29
+    data = (df << n_bits) | (int.from_bytes(rng.bytes(n_hex // 2), 'big') & ((1 << n_bits) - 1))
+    data_hex = f"{data:0{n_hex - 6}X}"
+    parity = pms.crc(data_hex + '000000') ^ address
+    return data_hex + f"{parity:06X}"
+
+
+# синдромы совпадают с pms.crc для правильных и испорченных сообщений
+def test_crc_matches_pymodes():
+    messages = ADSB_MESSAGES + [flip(m, int(b)) for m in ADSB_MESSAGES for b in rng.integers(5, 112, 4)]
+    expected = [pms.crc(m) for m in messages]
+    assert crc_syndromes(messages_to_matrix(messages)).tolist() == expected
+    assert [crc_syndrome(m) for m in messages] == expected
+    assert expected[:len(ADSB_MESSAGES)] == [0] * len(ADSB_MESSAGES)
+
+
+# адреса из ответов наблюдения df 4/5/20/21 совпадают с pms.icao
+@pytest.mark.parametrize('df', [4, 5, 20, 21])
+def test_surveillance_address_matches_pymodes(df):
+    messages = [surveillance_reply(df, int(a)) for a in rng.integers(0, 1 << 24, 20)]
+    expected = [pms.icao(m) for m in messages]
+    assert [surveillance_address(m) for m in messages] == expected
+
+    matrix = messages_to_matrix(messages)
+    address = recover_addresses(matrix, decode_headers(matrix)['df'], message_lengths(messages))
+    assert [f"{a:06X}" for a in address.tolist()] == expected
+
+
+# ошибка в одном бите (кроме поля df) исправляется до исходного сообщения
+def test_single_bit_flip_corrected():
+    for msg in ADSB_MESSAGES:
+        for bit in range(5, MESSAGE_BYTES * 8):
+            bad = flip(msg, bit)
+            assert pms.crc(bad) != 0
+            assert correct_message(bad) == (msg, CRC_CORRECTED)
+    assert correct_message(ADSB_MESSAGES[0]) == (ADSB_MESSAGES[0], CRC_OK)
+
+    bad = [flip(m, 5 + i) for i, m in enumerate(ADSB_MESSAGES)]
+    matrix = messages_to_matrix(bad)
+    fixed, corrected, rejected = correct_adsb(matrix, decode_headers(matrix)['df'], message_lengths(bad))
+    assert corrected.all() and not rejected.any()
+    assert [row.tobytes().hex().upper() for row in fixed] == ADSB_MESSAGES
+
+
+# ошибка в двух битах отбрасывается, а не "исправляется" в другое сообщение
+def test_two_bit_flip_rejected():
+    bad = []
+    for msg in ADSB_MESSAGES:
+        for _ in range(50):
+            b1, b2 = rng.choice(np.arange(5, MESSAGE_BYTES * 8), 2, replace=False)
+            bad.append(flip(msg, int(b1), int(b2)))
+    assert all(correct_message(m) == (None, CRC_REJECTED) for m in bad)
+
+    matrix = messages_to_matrix(bad)
+    _, corrected, rejected = correct_adsb(matrix, decode_headers(matrix)['df'], message_lengths(bad))
+    assert rejected.all() and not corrected.any()
+
+
+# nl совпадает с pms.common.cprNL, в том числе у границ зон, у 87 градусов и у экватора
+def test_nl_matches_pymodes():
+    lat = np.concatenate([_NL_EDGES, _NL_EDGES - 1e-6, _NL_EDGES + 1e-6,
+                          _NL_EDGES - 1e-12, _NL_EDGES + 1e-12,
+                          [0.0, 1e-9, 86.9999, 87.0, 87.0001, 89.99, 90.0],
+                          rng.uniform(0, 90, 1000)])
+    lat = np.concatenate([lat, -lat])
+    assert cpr_nl(lat).tolist() == [pms.common.cprNL(float(x)) for x in lat]
+
+
+# cpr кодирование координат (как в передатчике): 17-битные широта и долгота
+def cpr_encode(lat, lon, oe):
+    d_lat = 360 / (60 - oe)
+    yz = np.floor(CPR_SCALE * np.mod(lat, d_lat) / d_lat + 0.5)
+    r_lat = d_lat * (yz / CPR_SCALE + np.floor(lat / d_lat))
+    d_lon = 360 / max(pms.common.cprNL(float(r_lat)) - oe, 1)
+    xz = np.floor(CPR_SCALE * np.mod(lon, d_lon) / d_lon + 0.5)
+    return int(yz) % CPR_SCALE, int(xz) % CPR_SCALE
+
+
+# сообщение о положении в воздухе с заданными cpr координатами на основе ADSB_MESSAGES[0]
+def position_message(lat, lon, oe):
+    lat_cpr, lon_cpr = cpr_encode(lat, lon, oe)
+    data = int(ADSB_MESSAGES[0][:22], 16)
+    data &= ~((1 << 35) - 1)
+    data |= (oe << 34) | (lat_cpr << 17) | lon_cpr
+    data_hex = f"{data:022X}"
+    return data_hex + f"{pms.crc(data_hex + '000000'):06X}"
+
+
+# пары чётных и нечётных сообщений: известная пара pyModeS, случайные точки, широты у границ
+# зон и пары по разные стороны границы (pyModeS их отбрасывает)
+def position_pairs():
+    points = [(52.2572, 3.91937), (-33.9, 151.2), (0.01, -0.01), (86.99, 10.0), (-87.01, -170.0)]
+    points += [(float(e + d), float(rng.uniform(-180, 180))) for e in _NL_EDGES[::7] for d in (-0.002, 0.002)]
+    points += [(float(rng.uniform(-85, 85)), float(rng.uniform(-180, 180))) for _ in range(40)]
+    pairs = [(ADSB_MESSAGES[0], ADSB_MESSAGES[1])]
+    pairs += [(position_message(la, lo, 0), position_message(la, lo, 1)) for la, lo in points]
+    pairs += [(position_message(float(e - 0.01), 20.0, 0), position_message(float(e + 0.01), 20.0, 1))
+              for e in _NL_EDGES[::5]]
+    return pairs
+
+
+# глобальное декодирование совпадает с pms.adsb.position для обоих порядков сообщений
+@pytest.mark.parametrize('even_newer', [False, True])
+def test_cpr_global_matches_pymodes(even_newer):
+    pairs = position_pairs()
+    even = messages_to_matrix([p[0] for p in pairs])
+    odd = messages_to_matrix([p[1] for p in pairs])
+    lat_even, lon_even = cpr_fields(even)
+    lat_odd, lon_odd = cpr_fields(odd)
+    lat, lon, valid = cpr_global(lat_even / CPR_SCALE, lon_even / CPR_SCALE,
+                                 lat_odd / CPR_SCALE, lon_odd / CPR_SCALE,
+                                 np.full(len(pairs), even_newer))
+    t_even, t_odd = (1, 0) if even_newer else (0, 1)
+    for i, (msg_even, msg_odd) in enumerate(pairs):
+        expected = pms.adsb.position(msg_even, msg_odd, t_even, t_odd)
+        if expected is None:
+            assert not valid[i]
+        else:
+            assert valid[i]
+            assert (lat[i], lon[i]) == pytest.approx(expected, abs=1e-9)
+
+
+# локальное декодирование совпадает с pms.adsb.position_with_ref
+def test_cpr_local_matches_pymodes():
+    cases = [(ADSB_MESSAGES[2], 49.0, 6.0), (ADSB_MESSAGES[3], 49.0, 6.0)]
+    for msg_even, msg_odd in position_pairs()[1:]:
+        lat, lon = pms.adsb.position(msg_even, msg_odd, 0, 1) or (None, None)
+        if lat is None:
+            continue
+        ref = (lat + float(rng.uniform(-0.5, 0.5)), lon + float(rng.uniform(-0.5, 0.5)))
+        cases += [(msg_even, *ref), (msg_odd, *ref)]
+
+    matrix = messages_to_matrix([c[0] for c in cases])
+    lat_cpr, lon_cpr = cpr_fields(matrix)
+    oe = (matrix[:, 6] >> 2) & 1
+    lat_ref = np.array([c[1] for c in cases])
+    lon_ref = np.array([c[2] for c in cases])
+    lat, lon = cpr_local(lat_cpr / CPR_SCALE, lon_cpr / CPR_SCALE, oe.astype(np.int64), lat_ref, lon_ref)
+    for i, (msg, la, lo) in enumerate(cases):
+        assert (lat[i], lon[i]) == pytest.approx(pms.adsb.position_with_ref(msg, la, lo), abs=1e-9)
@@ -1,17 +1,77 @@
-from datetime import datetime, timezone
+import re
+import numpy as np
+from datetime import datetime, timedelta, timezone
 
-# конвертация unix timestamp в объект datetime
-def timestamp_to_utc(timestamp):
-    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+# число наносекунд в секунде
+NS_PER_SEC = 1_000_000_000
+NS_PER_DAY = 86400 * NS_PER_SEC
+
+# разбор строки времени "секунды.доли" сразу в целое число наносекунд
+# (без промежуточного float, который теряет точность на эпохе 1.7e9)
+def parse_timestamp_ns(text):
+    sec, _, frac = text.partition('.')
+    # обычный случай: ровно 9 знаков после точки
+    if len(frac) == 9 and sec.isdigit() and frac.isdigit():
+        return int(sec + frac)
+    if not sec.isdigit() or (frac and not frac.isdigit()):
+        raise ValueError(f"некорректное время: {text!r}")
+    return int(sec) * NS_PER_SEC + int(frac[:9].ljust(9, '0'))
+
+# дата и время UTC в аргументах командной строки: "ГГГГ-ММ-ДД[ ЧЧ:ММ[:СС[.доли]]]",
+# вместо пробела допускается T, в конце - Z
+UTC_TIME_RE = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})(?:[ T](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d*))?)?)?Z?')
+
+# время из аргумента командной строки в наносекундах: unix время "секунды[.доли]"
+# или дата и время UTC
+def parse_time_arg(text):
+    text = text.strip()
+    m = UTC_TIME_RE.fullmatch(text)
+    if m is None:
+        return parse_timestamp_ns(text)
+    fields = [int(g) if g else 0 for g in m.groups()[:6]]
+    try:
+        sec = int(datetime(*fields, tzinfo=timezone.utc).timestamp())
+    except ValueError:
+        raise ValueError(f"некорректное время: {text!r}") from None
+    return sec * NS_PER_SEC + int((m.group(7) or '')[:9].ljust(9, '0'))
+
+# конвертация времени в наносекундах в объект datetime
+def timestamp_to_utc(timestamp_ns):
+    sec, ns = divmod(int(timestamp_ns), NS_PER_SEC)
+    return datetime.fromtimestamp(sec, tz=timezone.utc) + timedelta(microseconds=ns // 1000)
 
 # формат времени с наносекундами
-def format_timestamp_with_nanoseconds(ts):
+def format_timestamp_with_nanoseconds(ts_ns):
     # форматируем основную часть времени (до секунд)
-    main_dt = datetime.fromtimestamp(int(ts), tz=timezone.utc)
+    sec, ns = divmod(int(ts_ns), NS_PER_SEC)
+    main_dt = datetime.fromtimestamp(sec, tz=timezone.utc)
     main_dt_str = main_dt.strftime('%Y-%m-%d %H:%M:%S')
     
     # дробная часть времени (наносекунды)
-    ts_str = f"{ts:.9f}"
-    nanoseconds_str = ts_str.split('.')[1]
-    
-    return f"{main_dt_str}.{nanoseconds_str}"
\ No newline at end of file
+    return f"{main_dt_str}.{ns:09d}"
+
+# массив времён в datetime64[ns]: целые - наносекунды, дробные - секунды unix времени
+def to_datetime64(timestamps):
+    arr = np.asarray(timestamps)
+    if arr.dtype.kind == 'f':
+        arr = np.round(arr * NS_PER_SEC)
+    return arr.astype(np.int64).astype('datetime64[ns]')
+
+# массив времён в числа дат matplotlib (дни от эпохи matplotlib) без создания
+# объектов datetime; разность считается в целых наносекундах
+def to_datenums(timestamps):
+    # matplotlib нужен только для эпохи, при разборе логов не импортируется
+    from matplotlib.dates import get_epoch
+    epoch_ns = np.datetime64(get_epoch(), 'ns').astype(np.int64)
+    ns = to_datetime64(timestamps).astype(np.int64)
+    return (ns - epoch_ns) / NS_PER_DAY
+
+# формат массива времён с наносекундами, результат - массив строк
+def format_timestamps_with_nanoseconds(timestamps):
+    ns = to_datetime64(timestamps).astype(np.int64)
+    if ns.size == 0:
+        return np.array([], dtype=str)
+    sec, frac = np.divmod(ns, NS_PER_SEC)
+    main = np.char.replace(np.datetime_as_string(sec.astype('datetime64[s]'), unit='s'), 'T', ' ')
+    return np.char.add(np.char.add(main, '.'), np.char.zfill(frac.astype(str), 9))
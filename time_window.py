@@ -0,0 +1,75 @@
+import os
+from parsing import parse_log_block
+from time_formatter import NS_PER_SEC
+
+# размер части файла, которая после двоичного поиска просматривается подряд (байт)
+BISECT_BLOCK = 1 << 16
+
+# строки лога, начинающиеся не раньше pos: пары (смещение, время в нс);
+# чтение начинается с ближайшего перевода строки, строки без времени пропускаются
+def _lines_from(f, pos):
+    f.seek(max(pos - 1, 0))
+    if pos > 0:
+        f.readline()
+    while True:
+        start = f.tell()
+        line = f.readline()
+        if not line:
+            return
+        timestamps, _ = parse_log_block(line)
+        if timestamps:
+            yield start, timestamps[0]
+
+# смещение первой строки со временем не меньше t (нс) в файле, записанном по времени:
+# двоичный поиск по смещениям в [lo, hi), последние BISECT_BLOCK байт просматриваются подряд.
+# size - если таких строк нет
+def find_offset(f, size, t, lo=0, hi=None):
+    hi = size if hi is None else hi
+    while hi - lo > BISECT_BLOCK:
+        mid = (lo + hi) // 2
+        start, ts = next(_lines_from(f, mid), (size, None))
+        if ts is None or ts >= t:
+            hi = mid
+        else:
+            lo = start + 1
+    for start, ts in _lines_from(f, lo):
+        if ts >= t:
+            return start
+    return size
+
+# смещение первой строки со временем не меньше t; по индексу смещений (если есть)
+# поиск сужается до строк той секунды, в которую попадает t
+def _window_edge(f, size, t, index):
+    lo, hi = 0, size
+    if index is not None:
+        lo = index.bucket_offset(t)
+        if lo is None:
+            return size
+        hi = index.bucket_offset(t + NS_PER_SEC)
+        hi = size if hi is None else hi
+    return find_offset(f, size, t, lo, hi)
+
+# байтовый диапазон [начало, конец) строк со временем от start до end включительно (нс);
+# None - без границы с этой стороны
+def window_range(file_path, start=None, end=None, index=None):
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        lo = 0 if start is None else _window_edge(f, size, start, index)
+        hi = size if end is None else _window_edge(f, size, end + 1, index)
+    return lo, max(lo, hi)
+
+# часть файла [lo, hi)
+def read_range(file_path, lo, hi):
+    with open(file_path, "rb") as f:
+        f.seek(lo)
+        return f.read(hi - lo)
+
+# сообщения со временем от start до end включительно (строки на границах части файла
+# могут выходить за интервал, если время в логе немонотонно)
+def select_window(timestamps, messages, start=None, end=None):
+    if start is None and end is None:
+        return timestamps, messages
+    lo = start if start is not None else float('-inf')
+    hi = end if end is not None else float('inf')
+    pairs = [(t, m) for t, m in zip(timestamps, messages) if lo <= t <= hi]
+    return [t for t, _ in pairs], [m for _, m in pairs]